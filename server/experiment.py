@@ -10,8 +10,7 @@ from .storage_orm import Storage
 from .utils import build_experiment_app
 
 def create_experiment_app(experiment_name: str, project_root: str, session_secret: str, 
-                         session_cookie_opts: dict, current_active: callable, 
-                         invoke_and_log: callable) -> FastAPI:
+                         session_cookie_opts: dict, current_active: callable) -> FastAPI:
     """Create a FastAPI app for a specific experiment."""
     return build_experiment_app(
         experiment_name=experiment_name,
@@ -19,7 +18,6 @@ def create_experiment_app(experiment_name: str, project_root: str, session_secre
         session_secret=session_secret,
         session_cookie_opts=session_cookie_opts,
         current_active=current_active,
-        invoke_and_log=invoke_and_log,
     )
 
 def get_active_storage(experiments_dir: str, active_experiment_getter) -> Storage:
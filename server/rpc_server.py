@@ -2,42 +2,65 @@
 # rpc_server.py
 from fastapi import FastAPI, HTTPException, Query, Depends, status, Request, Response, Body
 import logging
-from fastapi.staticfiles import StaticFiles
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import FileResponse
-from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel, validator, Field
-from typing import Any, Callable, Dict, List, Optional, Literal
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+from typing import Annotated, Any, Callable, Dict, Optional, Literal
 import re
-from starlette.middleware.sessions import SessionMiddleware
+import asyncio
+import contextlib
 import secrets
+import hmac
 import inspect
 import json
 import os
 import sys
+import threading
 import datetime
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 try:
-    from .storage_orm import Storage  # when imported as package (server.rpc_server)
+    from .storage_orm import Storage, _utcnow  # when imported as package (server.rpc_server)
     from .utils import (
         enc as _enc,
-        resolve_log_filters as _resolve_log_filters,
+        enc_bytes as _enc_bytes,
+        LogQuery,
+        LeanCORSMiddleware,
+        PathScopedSessionMiddleware,
+        get_call_wrapper as _get_call_wrapper,
+        get_call_mode as _get_call_mode,
+        CALL_ASYNC,
+        CALL_THREAD,
+        describe_functions as _describe_functions,
         load_functions_from_directory as _load_functions_from_directory,
+        resolve_function as _resolve_function,
         load_admin_credentials as _load_admin_credentials_from_path,
         NoCacheHTMLMiddleware,
+        send_redirect_to_landing,
         build_experiment_app,
     )
 except ImportError:  # pragma: no cover
-    from storage_orm import Storage  # when executed as script
+    from storage_orm import Storage, _utcnow  # when executed as script
     from utils import (
         enc as _enc,
-        resolve_log_filters as _resolve_log_filters,
+        enc_bytes as _enc_bytes,
+        LogQuery,
+        LeanCORSMiddleware,
+        PathScopedSessionMiddleware,
+        get_call_wrapper as _get_call_wrapper,
+        get_call_mode as _get_call_mode,
+        CALL_ASYNC,
+        CALL_THREAD,
+        describe_functions as _describe_functions,
         load_functions_from_directory as _load_functions_from_directory,
+        resolve_function as _resolve_function,
         load_admin_credentials as _load_admin_credentials_from_path,
         NoCacheHTMLMiddleware,
+        send_redirect_to_landing,
         build_experiment_app,
     )
 
@@ -63,6 +86,8 @@ def _validate_safe_string(value: str, max_length: int = 255, allow_empty: bool =
             raise ValueError(f"Invalid characters or patterns detected")
     return value
 
+_SCALAR_ARG_TYPES = frozenset((int, float, bool))
+
 def _validate_function_args(args: list[Any], max_args: int = 10, max_depth: int = 5) -> list[Any]:
     """Validate function arguments for safety."""
     if len(args) > max_args:
@@ -77,8 +102,16 @@ def _validate_function_args(args: list[Any], max_args: int = 10, max_depth: int
         elif isinstance(obj, (list, tuple)):
             if len(obj) > 1000:  # Prevent huge lists
                 raise ValueError("List argument too long")
-            for item in obj:
-                check_value(item, depth + 1)
+            if depth < max_depth:
+                # Numeric arrays are the common payload; accept scalars inline
+                # instead of recursing once per element.
+                for item in obj:
+                    if item is None or type(item) in _SCALAR_ARG_TYPES:
+                        continue
+                    check_value(item, depth + 1)
+            else:
+                for item in obj:
+                    check_value(item, depth + 1)
         elif isinstance(obj, dict):
             if len(obj) > 100:  # Prevent huge dicts
                 raise ValueError("Dict argument too large")
@@ -116,342 +149,175 @@ SESSION_KW = dict(max_age=7*24*3600, same_site="lax", https_only=False, path="/"
 from .state import server_state as _server_state
 
 # Import shared utilities instead of duplicating
-from .utils import enc as _enc, resolve_log_filters as _resolve_log_filters
+from .utils import enc as _enc
+
+# Buffered log writes: _ainvoke_and_log enqueues rows and _log_flusher writes them
+# in batches (one transaction per batch) off the request path.
+_LOG_QUEUE_MAX = 10_000
+_LOG_BATCH_MAX = 256
+_LOG_FLUSH_INTERVAL = 0.05
+_log_queue: Optional[asyncio.Queue] = None
+_log_loop: Optional[asyncio.AbstractEventLoop] = None
+_log_flusher_task: Optional[asyncio.Task] = None
+# Rows that arrived while the queue was full; spilled together on a worker thread
+_log_overflow: list[tuple[Storage, Dict[str, Any]]] = []
+# Overflow writes still running on the executor; shutdown waits for them
+_log_spills: set[asyncio.Future] = set()
+
+def _spill_log_overflow() -> None:
+    batch = _log_overflow[:]
+    _log_overflow.clear()
+    if batch:
+        spill = asyncio.get_running_loop().run_in_executor(None, _write_log_batch, batch)
+        _log_spills.add(spill)
+        spill.add_done_callback(_log_spills.discard)
+
+def _put_log(storage: Storage, row: Dict[str, Any]) -> None:
+    try:
+        _log_queue.put_nowait((storage, row))
+    except asyncio.QueueFull:
+        # Don't drop rows under back-pressure; write overflow in batches too
+        # rather than one transaction per row
+        _log_overflow.append((storage, row))
+        # Once shutdown has begun, _stop_log_flusher writes whatever is left here
+        if len(_log_overflow) == 1 and _log_loop is not None:
+            _log_loop.call_later(_LOG_FLUSH_INTERVAL, _spill_log_overflow)
+
+def _enqueue_log(storage: Storage, **row: Any) -> None:
+    """Queue a log row for the background flusher (sync write if it isn't running)."""
+    loop = _log_loop
+    if loop is None or loop.is_closed():
+        storage.log_event(**row)
+        return
+    loop.call_soon_threadsafe(_put_log, storage, row)
+
+def _write_log_batch(batch: list[tuple[Storage, Dict[str, Any]]]) -> None:
+    by_storage: Dict[int, tuple[Storage, list]] = {}
+    for storage, row in batch:
+        by_storage.setdefault(id(storage), (storage, []))[1].append(row)
+    for storage, rows in by_storage.values():
+        try:
+            storage.log_events_bulk(rows)
+        except Exception:
+            logging.exception("Failed to write %d log rows", len(rows))
+
+async def _log_flusher() -> None:
+    """Write queued rows in batches until shutdown enqueues the ``None`` sentinel."""
+    queue = _log_queue
+    while True:
+        item = await queue.get()
+        if item is None:
+            return
+        batch = [item]
+        await asyncio.sleep(_LOG_FLUSH_INTERVAL)
+        stop = False
+        while len(batch) < _LOG_BATCH_MAX and not queue.empty():
+            item = queue.get_nowait()
+            if item is None:
+                stop = True
+                break
+            batch.append(item)
+        await asyncio.to_thread(_write_log_batch, batch)
+        if stop:
+            return
+
+def _log_call(
+    storage: Storage, *, func_name: str, args: list[Any], student_id: str,
+    trial: Optional[str], result_json: Optional[str], error: Optional[str],
+) -> None:
+    _enqueue_log(
+        storage,
+        # Stamped now: the flusher may write the row well after the call
+        ts=_utcnow(),
+        student_id=student_id,
+        experiment_name=_server_state.get_active_experiment(),
+        trial=trial,
+        func_name=func_name,
+        args_json=_enc(args),
+        result_json=result_json,
+        error=error,
+    )
 
-def _invoke_and_log(
+async def _ainvoke_and_log(
     *, storage: Storage, fn: Callable[..., Any], func_name: str,
     args: list[Any], student_id: str, trial: Optional[str],
-):
-    """Invoke function and persist result/error to storage."""
+) -> bytes:
+    """Invoke ``fn`` and queue its result/error for storage. Coroutine functions are
+    awaited, functions marked ``__leap_inline__`` run on the event loop and
+    everything else runs in the threadpool.
+
+    Returns the JSON-encoded result; the same bytes are logged and sent back.
+    """
+    log_kw = dict(func_name=func_name, args=args, student_id=student_id, trial=trial)
+    call = _get_call_wrapper(fn)
+    mode = _get_call_mode(fn)
     try:
-        result = fn(*args)
-        storage.log_event(
-            student_id=student_id,
-            experiment_name=_server_state.get_active_experiment(),
-            trial=trial,
-            func_name=func_name,
-            args_json=_enc(args),
-            result_json=_enc(result),
-            error=None,
-        )
-        return result
+        if mode == CALL_ASYNC:
+            result = await call(args)
+        elif mode == CALL_THREAD:
+            result = await run_in_threadpool(call, args)
+        else:
+            result = call(args)
     except Exception as e:
-        storage.log_event(
-            student_id=student_id,
-            experiment_name=_server_state.get_active_experiment(),
-            trial=trial,
-            func_name=func_name,
-            args_json=_enc(args),
-            result_json=None,
-            error=str(e),
-        )
+        _log_call(storage, **log_kw, result_json=None, error=str(e))
         raise
+    result_json = _enc_bytes(result)
+    _log_call(storage, **log_kw, result_json=result_json.decode(), error=None)
+    return result_json
 
 def create_experiment_app(experiment_name: str) -> FastAPI:
-    experiment_dir = os.path.join(_project_root, "experiments", experiment_name)
-    if not os.path.isdir(experiment_dir):
-        return None
-
-    db_path = os.path.join(experiment_dir, "db/students.db")
-    if not os.path.exists(db_path):
-        logging.info("Database file not found at %s. A new one will be created.", db_path)
-    funcs_dir = os.path.join(experiment_dir, "funcs")
-    ui_dir = os.path.join(experiment_dir, "ui")
-    logging.debug("Creating app for experiment '%s' with db_path: %s", experiment_name, db_path)
-    storage = Storage(db_path)
-
-    function_registry: Dict[str, Callable[..., Any]] = _load_functions_from_directory(funcs_dir)
-
-    def reload_functions() -> int:
-        nonlocal function_registry
-        new_funcs = _load_functions_from_directory(funcs_dir)
-        function_registry = new_funcs
-        return len(function_registry)
-
-    app = FastAPI(title=f"Experiment: {experiment_name}")
-
-    app.mount("/ui", StaticFiles(directory=ui_dir), name="ui")
-
-    # IMPORTANT: add SessionMiddleware to the experiment app as well, so its
-    # /admin/* endpoints can persist authentication cookies correctly. Parent
-    # middleware does not wrap mounted sub-apps in Starlette.
-    app.add_middleware(SessionMiddleware, secret_key=_DERIVED_SESSION_SECRET, **SESSION_KW)
-
-    # Use global admin credentials
-    ADMIN_USERNAME, ADMIN_PASSWORD = _load_admin_credentials_from_path()
-
-    class LoginRequest(BaseModel):
-        username: str
-        password: str
-
-    @app.post("/admin/login")
-    async def login(request: Request, login_data: LoginRequest):
-        if login_data.username == ADMIN_USERNAME and login_data.password == ADMIN_PASSWORD:
-            request.session["authenticated"] = True
-            return {"message": "Login successful"}
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-
-    def is_admin_authenticated(request: Request):
-        if not request.session.get("authenticated"):
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-        return True
-
-    @app.post("/admin/logout")
-    async def logout(request: Request, response: Response):
-        request.session.clear()
-        response.delete_cookie("session")
-        return {"message": "Logged out"}
-
-    def _require_active_this_experiment():
-        active = _server_state.get_active_experiment()
-        if active is None:
-            raise HTTPException(status_code=409, detail="No active experiment. Start it from the landing page.")
-        if active != experiment_name:
-            raise HTTPException(status_code=409, detail=f"Experiment '{active}' is active. Open that UI or stop it first.")
-        return True
-
-    # Combined dependency: require admin AND active experiment (per-experiment)
-    def _require_admin_and_active(
-        authenticated: bool = Depends(is_admin_authenticated),
-        _active_ok: bool = Depends(_require_active_this_experiment),
-    ):
-        return True
-
-    @app.get("/files")
-    def list_files(ext: Optional[str] = Query(None), dir: Optional[str] = Query(None)):
-        """List files in the experiment's UI directory.
-
-        - Query params:
-          - ext: optional file extension filter (e.g., "md" or ".md").
-          - dir: optional subdirectory under UI (e.g., "quiz"). Single segment only.
-        """
-        files: list[str] = []
-        try:
-            norm_ext = None
-            if ext:
-                norm_ext = ext if ext.startswith(".") else f".{ext}"
-                norm_ext = norm_ext.lower()
-            base_dir = ui_dir
-            if dir:
-                # allow only a safe single-segment directory name to avoid traversal
-                if not re.match(r"^[A-Za-z0-9_-]+$", dir or ""):
-                    return {"files": []}
-                cand = os.path.join(ui_dir, dir)
-                if os.path.isdir(cand):
-                    base_dir = cand
-                else:
-                    return {"files": []}
-            for name in os.listdir(base_dir):
-                if norm_ext:
-                    if name.lower().endswith(norm_ext):
-                        files.append(name)
-                else:
-                    files.append(name)
-        except Exception:
-            pass
-        files.sort()
-        return {"files": files}
-
-    @app.post("/admin/reload-functions", dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def admin_reload_functions():
-        count = reload_functions()
-        return {"status": "ok", "functions": count}
-
-    @app.get("/admin/ping")
-    async def admin_ping(authenticated: bool = Depends(is_admin_authenticated)):
-        return {"ok": True}
-
-    @app.get("/functions")
-    def list_functions():
-        return {
-            name: {
-                "signature": str(inspect.signature(fn)),
-                "doc": (fn.__doc__ or "").strip()
-            }
-            for name, fn in function_registry.items()
-        }
-
-    # Students list requires admin + active experiment
-    @app.get("/students", dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def list_students_admin():
-        return {"students": storage.list_students()}
-
-    class CallRequest(BaseModel):
-        student_id: str = Field(..., max_length=255)
-        func_name: str = Field(..., max_length=255)
-        args: list[Any] = []
-        # New preferred name for tagging runs; kept 'experiment' for backward compatibility
-        trial: Optional[str] = Field(None, max_length=255)
-        experiment: Optional[str] = Field(None, max_length=255)
-        # Explicit experiment context; must match active experiment for root calls
-        experiment_name: Optional[str] = Field(None, max_length=255)
-
-        @validator('student_id', 'func_name')
-        def validate_required_strings(cls, v):
-            return _validate_safe_string(v)
-        
-        @validator('trial', 'experiment', 'experiment_name')
-        def validate_optional_strings(cls, v):
-            if v is not None:
-                return _validate_safe_string(v, allow_empty=True)
-            return v
-        
-        @validator('args')
-        def validate_args(cls, v):
-            return _validate_function_args(v)
-
-    @app.post("/call")
-    def call_function(req: CallRequest):
-        # Enforce experiment context: only allow calls when THIS experiment is active
-        active = _server_state.get_active_experiment()
-        if active is None:
-            raise HTTPException(status_code=409, detail="No active experiment. Start one from the landing page.")
-        if active != experiment_name:
-            raise HTTPException(status_code=409, detail=f"Experiment '{active}' is active. Open that UI or stop it first.")
-        if req.experiment_name and req.experiment_name != experiment_name:
-            raise HTTPException(status_code=409, detail=f"Mismatched experiment context. Expected '{experiment_name}', got '{req.experiment_name}'.")
-        if req.func_name not in function_registry:
-            raise HTTPException(status_code=404, detail=f"Function '{req.func_name}' not found")
-        if not storage.student_exists(req.student_id):
-            raise HTTPException(status_code=403, detail=f"Invalid student ID '{req.student_id}'")
-
-        fn = function_registry[req.func_name]
-
-        trial_name = req.trial or req.experiment
-
-        try:
-            result = _invoke_and_log(
-                storage=storage, fn=fn, func_name=req.func_name,
-                args=req.args, student_id=req.student_id, trial=trial_name,
-            )
-        except Exception as e:
-            raise HTTPException(status_code=400, detail=f"Function execution error: {e}")
-
-        return {"result": jsonable_encoder(result)}
-
-    class AddStudentBody(BaseModel):
-        student_id: str
-        name: str
-        email: Optional[str] = None
-
-    @app.post("/admin/add-student", dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def add_student(body: AddStudentBody):
-        storage.add_student(student_id=body.student_id, name=body.name, email=body.email)
-        return {"status": "ok"}
-
-    class BulkAddStudentsBody(BaseModel):
-        students: List[Dict[str, str]]
-
-    @app.post("/admin/add-students-bulk", dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def add_students_bulk(body: BulkAddStudentsBody):
-        """Bulk add students for efficient CSV uploads."""
-        result = storage.add_students_bulk(body.students)
-        return {"status": "ok", **result}
-
-    @app.get("/admin/students", dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def list_all_students():
-        return {"students": storage.list_students()}
-
-    @app.delete("/admin/student/{student_id}", status_code=200, dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def remove_student(student_id: str):
-        was_deleted = storage.delete_student(student_id)
-        if not was_deleted:
-            raise HTTPException(status_code=404, detail=f"Student ID '{student_id}' not found.")
-        return {"status": "ok", "message": f"Student '{student_id}' and all associated logs have been deleted."}
-
-    @app.get("/admin/logs", dependencies=[Depends(is_admin_authenticated), Depends(_require_active_this_experiment)])
-    def get_server_logs(
-        student_id: Optional[str] = Query(None),
-        experiment_name: Optional[str] = Query(None),
-        trial: Optional[str] = Query(None),
-        n: int = Query(100, ge=1, le=10_000),
-        order: Literal["latest", "earliest"] = Query("latest"),
-    ):
-        eff_trial = trial or experiment_name
-        logs = storage.fetch_logs(student_id=student_id, experiment_name=eff_trial, n=n, order=order)
-        return {"logs": logs}
-
-    @app.get("/logs")
-    def get_logs(
-        student_id: Optional[str] = Query(None),
-        experiment_name: Optional[str] = Query(None),
-        sid: Optional[str] = Query(None),
-        exp: Optional[str] = Query(None),
-        trial: Optional[str] = Query(None),
-        trial_name: Optional[str] = Query(None),
-        n: int = Query(100, ge=1, le=10_000),
-        order: Literal["latest", "earliest"] = Query("latest"),
-        start_time: Optional[datetime.datetime] = Query(None),
-        end_time: Optional[datetime.datetime] = Query(None),
-        _active_ok: bool = Depends(_require_active_this_experiment),
-    ):
-        eff_student, eff_experiment = _resolve_log_filters(
-            student_id=student_id, sid=sid,
-            experiment_name=experiment_name, exp=exp,
-            trial=trial, trial_name=trial_name,
-        )
-        logs = storage.fetch_logs(
-            student_id=eff_student, 
-            experiment_name=eff_experiment, 
-            n=n, 
-            order=order,
-            start_time=start_time,
-            end_time=end_time,
-        )
-        return {"logs": logs}
-
-    @app.get("/log-options")
-    def get_log_options():
-        students = storage.distinct_students_with_logs()
-        experiments = storage.distinct_experiments()
-        return {"students": students, "experiments": experiments, "trials": experiments}
-
-    return app
-
-# Override with factory-based implementation for simplicity and consistency.
-def create_experiment_app(experiment_name: str) -> FastAPI:  # type: ignore[no-redef]
     return build_experiment_app(
         experiment_name=experiment_name,
         project_root=_project_root,
         session_secret=_DERIVED_SESSION_SECRET,
         session_cookie_opts=SESSION_KW,
         current_active=_server_state.get_active_experiment,
-        invoke_and_log=_invoke_and_log,
     )
 
-app = FastAPI(title="Classroom RPC Server")
+@contextlib.asynccontextmanager
+async def _lifespan(_app: FastAPI):
+    await _start_log_flusher()
+    try:
+        yield
+    finally:
+        await _stop_log_flusher()
+
+app = FastAPI(title="Classroom RPC Server", default_response_class=ORJSONResponse, lifespan=_lifespan)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*", "null"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-app.add_middleware(SessionMiddleware, secret_key=_DERIVED_SESSION_SECRET, **SESSION_KW)
+# Allowed browser origins (comma-separated CORS_ALLOW_ORIGINS); "*" also covers
+# the "null" origin of file:// pages.
+CORS_ALLOW_ORIGINS = [o.strip() for o in os.environ.get("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()] or ["*"]
+
+app.add_middleware(LeanCORSMiddleware, allow_origins=CORS_ALLOW_ORIGINS, allow_credentials=True)
+# Only routes that read/write the session get SessionMiddleware; mounted /exp/* apps
+# install their own, and public routes like /call skip cookie parsing.
+_SESSION_PATH_PREFIXES = ("/admin/", "/api/", "/students")
+app.add_middleware(PathScopedSessionMiddleware, prefixes=_SESSION_PATH_PREFIXES, secret_key=_DERIVED_SESSION_SECRET, **SESSION_KW)
 
 app.add_middleware(NoCacheHTMLMiddleware)
+# Large /logs (n up to 10k) and /functions payloads are repetitive JSON; compress on the fly.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # Guard root-mounted UI (default experiment) so it's only reachable when that
 # same experiment is active. Otherwise redirect to landing.
-class _RootUIGuard(BaseHTTPMiddleware):
+class _RootUIGuard:
     def __init__(self, app, *, get_active: callable, get_default: callable):
-        super().__init__(app)
+        self.app = app
         self._get_active = get_active
         self._get_default = get_default
 
-    async def dispatch(self, request, call_next):
-        try:
-            path = request.url.path or ''
-            if path.startswith('/ui') or path.startswith('/static'):
-                active = self._get_active()
-                default = self._get_default()
-                if default and active != default:
-                    from starlette.responses import RedirectResponse
-                    return RedirectResponse(url='/', status_code=307)
-        except Exception:
-            pass
-        return await call_next(request)
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            try:
+                path = scope["path"]
+                if path.startswith('/ui') or path.startswith('/static'):
+                    active = self._get_active()
+                    default = self._get_default()
+                    if default and active != default:
+                        return await send_redirect_to_landing(send)
+            except Exception:
+                pass
+        await self.app(scope, receive, send)
 
 def _get_active_name():
     return _ACTIVE_EXPERIMENT
@@ -488,26 +354,67 @@ if _DEFAULT_EXPERIMENT:
     _default_ui_dir = os.path.join(_default_exp_dir, "ui")
     logging.info("Discovered default context: '%s' (UI binds here). Root APIs operate on the active experiment.", _DEFAULT_EXPERIMENT)
 
-    _default_storage = Storage(_default_db_path)
-    _default_function_registry: Dict[str, Callable[..., Any]] = _load_functions_from_directory(_default_funcs_dir)
     # Use global admin credentials instead of per-experiment credentials
     _DEFAULT_ADMIN_USERNAME, _DEFAULT_ADMIN_VERIFY = _load_admin_credentials_from_path()
 else:
     _default_ui_dir = os.path.join(_project_root, "experiments", "default", "ui")
-    _default_storage = None
-    _default_function_registry = {}
     # Use global admin credentials
     _DEFAULT_ADMIN_USERNAME, _DEFAULT_ADMIN_VERIFY = _load_admin_credentials_from_path()
+_DEFAULT_ADMIN_USERNAME_B = _DEFAULT_ADMIN_USERNAME.encode("utf-8")
 
 # Removed root-mounted /ui and /static; use canonical /exp/<experiment>/ui only.
 
+async def _start_log_flusher():
+    global _log_queue, _log_loop, _log_flusher_task
+    _log_queue = asyncio.Queue(maxsize=_LOG_QUEUE_MAX)
+    _log_loop = asyncio.get_running_loop()
+    _log_flusher_task = asyncio.create_task(_log_flusher())
+
+async def _stop_log_flusher():
+    global _log_loop, _log_flusher_task
+    # New rows are written synchronously from here on (_enqueue_log sees no loop);
+    # yield once so rows already handed over via call_soon_threadsafe reach the queue.
+    _log_loop = None
+    await asyncio.sleep(0)
+    task, _log_flusher_task = _log_flusher_task, None
+    if task is not None and not task.done():
+        # The sentinel queues behind every pending row, so the flusher writes its
+        # in-flight batch and the rest of the queue before it returns.
+        await _log_queue.put(None)
+        await task
+    pending = _log_overflow[:]
+    _log_overflow.clear()
+    while _log_queue is not None and not _log_queue.empty():
+        item = _log_queue.get_nowait()
+        if item is not None:
+            pending.append(item)
+    if pending:
+        _write_log_batch(pending)
+    if _log_spills:
+        await asyncio.gather(*_log_spills)
+    with _storages_lock:
+        storages = list(_storages.values())
+    for storage in storages:
+        storage.checkpoint()
+
+# path -> (mtime_ns, body); landing pages are re-read only when the file changes
+_html_cache: Dict[str, tuple[int, bytes]] = {}
+
+def _cached_html(path: str) -> Response:
+    mtime = os.stat(path).st_mtime_ns
+    cached = _html_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path, "rb") as f:
+            cached = _html_cache[path] = (mtime, f.read())
+    return Response(content=cached[1], media_type="text/html")
+
 @app.get("/")
 async def read_index():
-    return FileResponse(os.path.join(_current_dir, 'landing/index.html'))
+    return _cached_html(os.path.join(_current_dir, 'landing/index.html'))
 
 @app.get("/login")
 async def read_login():
-    return FileResponse(os.path.join(_current_dir, 'landing/login.html'))
+    return _cached_html(os.path.join(_current_dir, 'landing/login.html'))
 
 @app.get("/api/experiments")
 def list_experiments():
@@ -520,11 +427,20 @@ def list_experiments():
 def get_active_experiment():
     return {"active": _server_state.get_active_experiment()}
 
+# Encoded /api/health bodies keyed by active experiment (the only part that varies)
+_health_bodies: Dict[Optional[str], bytes] = {}
+
 @app.get("/api/health")
-def health():
-    return {"ok": True, "active": _server_state.get_active_experiment(), "version": APP_VERSION}
+async def health():
+    active = _server_state.get_active_experiment()
+    body = _health_bodies.get(active)
+    if body is None:
+        body = _health_bodies[active] = _enc_bytes({"ok": True, "active": active, "version": APP_VERSION})
+    return Response(content=body, media_type="application/json")
 
 class _StartExperimentBody(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     name: str
 
 # Require root admin auth for starting/stopping experiments
@@ -601,12 +517,17 @@ if os.path.isdir(experiments_dir):
 # -------------------------------
 
 class _RootLoginRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     username: str
     password: str
 
 @app.post("/admin/login")
 async def root_login(request: Request, login_data: _RootLoginRequest):
-    if login_data.username == _DEFAULT_ADMIN_USERNAME and _DEFAULT_ADMIN_VERIFY(login_data.password):
+    # The verifier runs even when the username is wrong, so both fail in the same time
+    user_ok = hmac.compare_digest(login_data.username.encode("utf-8"), _DEFAULT_ADMIN_USERNAME_B)
+    # PBKDF2 is CPU-bound; keep it off the event loop
+    if await run_in_threadpool(_DEFAULT_ADMIN_VERIFY, login_data.password, user_ok):
         request.session["authenticated"] = True
         return {"message": "Login successful"}
     raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
@@ -627,18 +548,32 @@ async def root_logout(request: Request, response: Response):
 async def root_admin_ping(authenticated: bool = Depends(_root_is_admin_authenticated)):
     return {"ok": True}
 
-def _require_active_root():
+async def _require_active_root():
     if _server_state.get_active_experiment() is None:
         raise HTTPException(status_code=409, detail="No active experiment. Start one from the landing page.")
     return True
 
+# db_path -> Storage; reused across requests so engines (and queued log rows) are shared
+_storages: Dict[str, Storage] = {}
+_storages_lock = threading.Lock()
+
+def _storage_for(experiment: str) -> Storage:
+    """Return the shared Storage for an experiment's DB, creating it on first use."""
+    db_path = os.path.join(_experiments_dir, experiment, "db", "students.db")
+    storage = _storages.get(db_path)
+    if storage is None:
+        with _storages_lock:
+            storage = _storages.get(db_path)
+            if storage is None:
+                storage = _storages[db_path] = Storage(db_path)
+    return storage
+
 def _get_active_storage() -> Storage:
     """Return a Storage bound to the currently active experiment DB."""
     active = _server_state.get_active_experiment()
     if active is None:
         raise HTTPException(status_code=409, detail="No active experiment. Start one from the landing page.")
-    db_path = os.path.join(_experiments_dir, active, "db", "students.db")
-    return Storage(db_path)
+    return _storage_for(active)
 
 def _get_active_registry() -> Dict[str, Callable[..., Any]]:
     """Return a function registry for the active experiment."""
@@ -657,22 +592,17 @@ def _require_admin_and_active_root(
 
 @app.get("/functions", dependencies=[Depends(_require_active_root)])
 def root_list_functions():
-    registry = _get_active_registry()
-    return {
-        name: {
-            "signature": str(inspect.signature(fn)),
-            "doc": (fn.__doc__ or "").strip()
-        }
-        for name, fn in registry.items()
-    }
+    return _describe_functions(_get_active_registry())
 
 # Students list requires admin + active experiment
 @app.get("/students")
 def root_list_students_admin(authenticated: bool = Depends(_root_is_admin_authenticated), _active_ok: bool = Depends(_require_active_root)):
     storage = _get_active_storage()
-    return {"students": storage.list_students()}
+    return Response(content=storage.students_json(), media_type="application/json")
 
 class _RootCallRequest(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     student_id: str = Field(..., max_length=255)
     func_name: str = Field(..., max_length=255)
     args: list[Any] = []
@@ -680,44 +610,67 @@ class _RootCallRequest(BaseModel):
     experiment: Optional[str] = Field(None, max_length=255)
     experiment_name: str = Field(..., max_length=255)
 
-    @validator('student_id', 'func_name', 'experiment_name')
+    @field_validator('student_id', 'func_name', 'experiment_name')
+    @classmethod
     def validate_safe_strings(cls, v):
         return _validate_safe_string(v)
     
-    @validator('trial', 'experiment')
+    @field_validator('trial', 'experiment')
+    @classmethod
     def validate_optional_strings(cls, v):
         if v is not None:
             return _validate_safe_string(v, allow_empty=True)
         return v
     
-    @validator('args')
+    @field_validator('args')
+    @classmethod
     def validate_args(cls, v):
         return _validate_function_args(v)
 
-@app.post("/call", dependencies=[Depends(_require_active_root)])
-def root_call_function(req: _RootCallRequest = Body(...)):
-    storage = _get_active_storage()
-    registry = _get_active_registry()
-    # Require explicit experiment_name from client and verify it matches the active experiment
+def _call_target(experiment: str, func_name: str, student_id: str) -> tuple[Storage, Optional[Callable[..., Any]], bool]:
+    """Look up everything /call needs in one go: storage, function and whether the student exists."""
+    storage = _storage_for(experiment)
+    fn = _resolve_function(os.path.join(_experiments_dir, experiment, "funcs"), func_name)
+    return storage, fn, fn is not None and storage.student_exists(student_id)
+
+def _validate_json_body(model: type[BaseModel], body: bytes):
+    """Parse + validate raw JSON in one pydantic-core pass; errors match FastAPI's 422."""
+    try:
+        return model.model_validate_json(body)
+    except ValidationError as e:
+        raise RequestValidationError([{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)])
+
+def _json_body_openapi(model: type[BaseModel]) -> dict:
+    return {"requestBody": {"required": True, "content": {"application/json": {"schema": model.model_json_schema()}}}}
+
+@app.post("/call", dependencies=[Depends(_require_active_root)], openapi_extra=_json_body_openapi(_RootCallRequest))
+async def root_call_function(request: Request):
+    req = _validate_json_body(_RootCallRequest, await request.body())
+    # Read the active experiment once; storage and function lookup both key off it
     active = _server_state.get_active_experiment()
+    # Require explicit experiment_name from client and verify it matches the active experiment
     if req.experiment_name != active:
         raise HTTPException(status_code=409, detail=f"Mismatched experiment context. Active='{active}', got='{req.experiment_name}'.")
-    if req.func_name not in registry:
+    # Opening the DB, (re)loading funcs and a cold student lookup all block; do them off the loop
+    storage, fn, student_ok = await run_in_threadpool(_call_target, active, req.func_name, req.student_id)
+    if fn is None:
         raise HTTPException(status_code=404, detail=f"Function '{req.func_name}' not found")
-    if not storage.student_exists(req.student_id):
+    if not student_ok:
         raise HTTPException(status_code=403, detail=f"Invalid student ID '{req.student_id}'")
-    fn = registry[req.func_name]
     trial_name = req.trial or req.experiment
     try:
-        result = _invoke_and_log(
+        result_json = await _ainvoke_and_log(
             storage=storage, fn=fn, func_name=req.func_name,
             args=req.args, student_id=req.student_id, trial=trial_name,
         )
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Function execution error: {e}")
-    return {"result": jsonable_encoder(result)}
+    # Result is already encoded (and logged); splice it in rather than re-serializing
+    return Response(content=b'{"result":' + result_json + b'}', media_type="application/json")
 
 class _RootAddStudentBody(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     student_id: str
     name: str
     email: Optional[str] = None
@@ -731,7 +684,7 @@ def root_add_student(body: _RootAddStudentBody = Body(...)):
 @app.get("/admin/students", dependencies=[Depends(_require_admin_and_active_root)])
 def root_list_all_students():
     storage = _get_active_storage()
-    return {"students": storage.list_students()}
+    return Response(content=storage.students_json(), media_type="application/json")
 
 @app.delete("/admin/student/{student_id}", status_code=200, dependencies=[Depends(_require_admin_and_active_root)])
 def root_remove_student(student_id: str):
@@ -752,7 +705,7 @@ def root_get_server_logs(
     storage = _get_active_storage()
     eff_trial = trial or experiment_name
     logs = storage.fetch_logs(student_id=student_id, trial=eff_trial, n=n, order=order)
-    return {"logs": logs}
+    return Response(content=_enc_bytes({"logs": logs}), media_type="application/json")
 
 @app.delete("/admin/logs/student/{student_id}", status_code=200, dependencies=[Depends(_require_admin_and_active_root)])
 def root_delete_logs_for_student(student_id: str):
@@ -760,41 +713,29 @@ def root_delete_logs_for_student(student_id: str):
     deleted = storage.delete_logs_by_student(student_id)
     return {"status": "ok", "deleted": deleted}
 
+# Log rows are already plain JSON types (decoded JSON columns, ISO ts strings), so the
+# /logs handlers encode them with enc_bytes directly and skip FastAPI's jsonable_encoder
+# pass over every nested value (enc_bytes also keeps ints wider than 64 bits exact).
 @app.get("/logs")
 def root_get_logs(
-    student_id: Optional[str] = Query(None),
-    experiment_name: Optional[str] = Query(None),
-    sid: Optional[str] = Query(None),
-    exp: Optional[str] = Query(None),
-    trial: Optional[str] = Query(None),
-    trial_name: Optional[str] = Query(None),
-    n: int = Query(100, ge=1, le=10_000),
-    order: Literal["latest", "earliest"] = Query("latest"),
-    start_time: Optional[datetime.datetime] = Query(None),
-    end_time: Optional[datetime.datetime] = Query(None),
+    q: Annotated[LogQuery, Query()],
     _active_ok: bool = Depends(_require_active_root),
 ):
     storage = _get_active_storage()
-    eff_student, eff_experiment = _resolve_log_filters(
-        student_id=student_id, sid=sid,
-        experiment_name=experiment_name, exp=exp,
-        trial=trial, trial_name=trial_name,
-    )
     logs = storage.fetch_logs(
-        student_id=eff_student,
-        trial=eff_experiment,
-        n=n,
-        order=order,
-        start_time=start_time,
-        end_time=end_time,
+        student_id=q.student_id,
+        trial=q.trial,
+        n=q.n,
+        order=q.order,
+        start_time=q.start,
+        end_time=q.end,
     )
-    return {"logs": logs}
+    return Response(content=_enc_bytes({"logs": logs}), media_type="application/json")
 
 @app.get("/log-options")
 def root_get_log_options():
     storage = _get_active_storage()
-    students = storage.distinct_students_with_logs()
-    experiments = storage.distinct_experiments()
+    students, experiments = storage.log_options()
     return {"students": students, "experiments": experiments, "trials": experiments}
 
 @app.get("/is-registered", dependencies=[Depends(_require_active_root)])
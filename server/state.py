@@ -6,7 +6,10 @@ from typing import Optional
 
 class ServerState:
     """Centralized state management for the server."""
-    
+
+    # Read on every request (get_active_experiment); slots keep attribute access cheap
+    __slots__ = ("active_experiment", "mounted_experiments")
+
     def __init__(self):
         self.active_experiment: Optional[str] = None
         self.mounted_experiments: set[str] = set()
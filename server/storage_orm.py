@@ -10,19 +10,83 @@ from __future__ import annotations
 from typing import Optional, List, Dict, Any
 import os
 import datetime
+import functools
 import json
 import logging
+import orjson
+import re
+import threading
+import time
 
-from sqlalchemy import create_engine, String, Integer, DateTime, Text, select, Sequence, asc, desc, delete, and_, distinct
+from sqlalchemy import event, create_engine, String, Integer, DateTime, Text, select, insert, Sequence, asc, desc, delete, and_, bindparam, distinct, func, text
 from sqlalchemy.exc import OperationalError
-from sqlalchemy.dialects import sqlite
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
 
 # Configure logging to a file if enabled
-if os.environ.get("ENABLE_SQL_LOGGING", "false").lower() in ("true", "1", "t"):
+_SQL_LOG_ENABLED = os.environ.get("ENABLE_SQL_LOGGING", "false").lower() in ("true", "1", "t")
+if _SQL_LOG_ENABLED:
     logging.basicConfig(filename='sql_debug.log', level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info("SQL logging is enabled.")
 
+# orjson parses integers beyond 64 bits as floats; values with a 20+ digit run go
+# through the stdlib decoder, which keeps them exact
+_LONG_DIGITS = re.compile(r"\d{20}")
+
+def _try_parse_json(json_str: Optional[str]) -> Any:
+    """Decode a stored JSON column, falling back to the raw string."""
+    if json_str is None:
+        return None
+    if _LONG_DIGITS.search(json_str):
+        try:
+            return json.loads(json_str)
+        except ValueError:
+            return json_str
+    try:
+        return orjson.loads(json_str)
+    except orjson.JSONDecodeError:
+        return json_str
+
+_UTC = datetime.timezone.utc
+
+def _utcnow() -> datetime.datetime:
+    """Naive UTC now, the form ``logs.ts`` stores (``datetime.utcnow`` is deprecated)."""
+    return datetime.datetime.now(_UTC).replace(tzinfo=None)
+
+def _naive_utc(dt: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """Convert an aware bound to the naive UTC that ``logs.ts`` stores.
+
+    An aware parameter binds as TIMESTAMPTZ, which makes DuckDB cast the ts column
+    on every row (no zonemap pruning, and the cast reads naive values as local time).
+    """
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(_UTC).replace(tzinfo=None)
+    return dt
+
+# Log timestamps are rendered as UTC ISO 8601 strings by DuckDB's strftime
+_TS_ISO_FORMAT = "%Y-%m-%dT%H:%M:%S.%f+00:00"
+
+# Every logs query has an explicit ORDER BY (or feeds a set), so DuckDB doesn't need
+# to keep insertion order through scans; threads/memory_limit defaults already
+# follow the host. checkpoint_threshold stays at its default on purpose: a stale
+# WAL is moved aside on startup (see Storage.__init__), so a bigger WAL would
+# put more rows at risk.
+_DUCKDB_CONFIG = {"preserve_insertion_order": False}
+
+def _log_sql(conn, cursor, statement, parameters, context, executemany) -> None:
+    logging.info("Generated SQL statement: %s params=%r", statement, parameters)
+
+def _create_engine(db_path: str):
+    # DuckDB is in-process and single-writer: a small bounded pool is plenty, and
+    # there is no server-side disconnect to pre-ping for.
+    engine = create_engine(
+        f"duckdb:///{db_path}", future=True, pool_size=4, max_overflow=2,
+        connect_args={"config": dict(_DUCKDB_CONFIG)},
+    )
+    if _SQL_LOG_ENABLED:
+        # Log the SQL actually sent to DuckDB, for every query (no extra compile)
+        event.listen(engine, "after_cursor_execute", _log_sql)
+    return engine
+
 class Base(DeclarativeBase):
     pass
 
@@ -37,19 +101,103 @@ log_id_seq = Sequence('log_id_seq')
 class Log(Base):
     __tablename__ = "logs"
     id: Mapped[int] = mapped_column(Integer, log_id_seq, primary_key=True, server_default=log_id_seq.next_value())
-    ts: Mapped[datetime.datetime] = mapped_column(DateTime, default=datetime.datetime.utcnow, index=True, nullable=False)
+    # No index on ts/func_name: DuckDB only uses ART indexes for selective equality
+    # lookups, never for ranges or ORDER BY (zonemaps cover those), so they only
+    # slowed down inserts. student_id keeps its index for per-student filters.
+    ts: Mapped[datetime.datetime] = mapped_column(DateTime, default=_utcnow, nullable=False)
     student_id: Mapped[str] = mapped_column(String, index=True, nullable=False)
     # True experiment id (e.g., "default", "quizlab")
     experiment_name: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     # Trial/run label within an experiment
     trial: Mapped[Optional[str]] = mapped_column(String, nullable=True)
-    func_name: Mapped[str] = mapped_column(String, index=True, nullable=False)
+    func_name: Mapped[str] = mapped_column(String, nullable=False)
     args_json: Mapped[str] = mapped_column(Text, nullable=False)
     result_json: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
     error: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
+_LOG_INSERT_COLUMNS = ("ts", "student_id", "experiment_name", "trial", "func_name", "args_json", "result_json", "error")
+_LOG_JSON_SHAPE = "[{" + ",".join(
+    f'"{c}":"{"TIMESTAMP" if c == "ts" else "VARCHAR"}"' for c in _LOG_INSERT_COLUMNS
+) + "}]"
+# id comes from the column's sequence default
+_INSERT_LOGS_FROM_JSON = text(
+    f"INSERT INTO logs ({', '.join(_LOG_INSERT_COLUMNS)}) "
+    f"SELECT {', '.join('r.' + c for c in _LOG_INSERT_COLUMNS)} "
+    f"FROM (SELECT unnest(from_json(:rows, '{_LOG_JSON_SHAPE}')) AS r)"
+)
+
+# Fixed statements built once at import; SQLAlchemy's compiled cache then reuses
+# their SQL on every execution.
+_SELECT_STUDENT_IDS = select(Student.student_id)
+_SELECT_STUDENTS = select(Student.student_id, Student.name, Student.email).order_by(Student.student_id)
+_COUNT_STUDENTS = select(func.count()).select_from(Student)
+_SELECT_LOG_OPTIONS = select(func.list(Log.student_id.distinct()), func.list(Log.trial.distinct()))
+_SELECT_DISTINCT_STUDENTS = select(distinct(Log.student_id)).order_by(asc(Log.student_id))
+_SELECT_DISTINCT_TRIALS = select(distinct(Log.trial)).where(Log.trial.is_not(None)).order_by(asc(Log.trial))
+
+@functools.lru_cache(maxsize=64)
+def _logs_select(
+    has_student: bool, has_experiment: bool, has_trial: bool,
+    has_start: bool, has_end: bool, earliest: bool,
+):
+    """fetch_logs SELECT for one filter shape; filter values and limit bind at execute."""
+    # Plain column tuples; no ORM identity map or per-row Log instances.
+    # ts is stored as naive UTC; DuckDB formats it for the whole result in
+    # one vectorized pass instead of building a datetime per row in Python.
+    stmt = select(
+        func.strftime(Log.ts, _TS_ISO_FORMAT).label("ts_iso"), Log.student_id, Log.experiment_name, Log.trial,
+        Log.func_name, Log.args_json, Log.result_json, Log.error,
+    )
+    conditions = []
+    if has_student:
+        conditions.append(Log.student_id == bindparam("student_id"))
+    if has_experiment:
+        conditions.append(Log.experiment_name == bindparam("experiment_name"))
+    if has_trial:
+        conditions.append(Log.trial == bindparam("trial"))
+    if has_start:
+        conditions.append(Log.ts >= bindparam("start_time"))
+    if has_end:
+        conditions.append(Log.ts <= bindparam("end_time"))
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    # Rows in one logged batch share a ts; id keeps their insertion order
+    order = (asc(Log.ts), asc(Log.id)) if earliest else (desc(Log.ts), desc(Log.id))
+    return stmt.order_by(*order).limit(bindparam("n", type_=Integer))
+
 class Storage:
+    # Registered student ids are cached in-process and re-read after this many
+    # seconds, so rows added by another process are picked up eventually.
+    STUDENT_CACHE_TTL = 30.0
+    # Dashboards poll /logs with identical filters; serve repeats from memory for a
+    # couple of seconds. Any log write/delete clears the cache.
+    LOGS_CACHE_TTL = 2.0
+    LOGS_CACHE_MAX = 256
+    # /log-options (distinct students/trials) is kept in memory: inserts merge into it,
+    # deletes drop it, and it is re-read after this many seconds regardless.
+    LOG_OPTIONS_TTL = 10.0
+    # Fold the WAL into the DB file after this many bulk log writes or seconds,
+    # whichever comes first (a leftover WAL is moved aside on the next start).
+    CHECKPOINT_EVERY_BATCHES = 100
+    CHECKPOINT_EVERY_SECONDS = 60.0
+
     def __init__(self, db_path: str):
+        self._schema_migrated = False
+        self._batches_since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        self._logs_cache: Dict[tuple, tuple[float, List[Dict[str, Any]]]] = {}
+        self._logs_cache_gen = 0
+        self._logs_cache_lock = threading.Lock()
+        self._student_ids: Optional[set[str]] = None
+        self._student_ids_at = 0.0
+        self._student_ids_gen = 0
+        self._student_ids_lock = threading.Lock()
+        self._students_body: Optional[bytes] = None
+        self._log_options: Optional[tuple[set[str], set[str]]] = None
+        self._log_options_at = 0.0
+        self._log_options_gen = 0
+        self._log_options_lock = threading.Lock()
+
         # Ensure parent directory exists so DuckDB can create the file
         try:
             db_dir = os.path.dirname(os.path.abspath(db_path))
@@ -76,9 +224,14 @@ class Storage:
             # Non-fatal; proceed to attempt open regardless
             logging.debug(f"Could not handle WAL backup: {e}")
 
-        self.engine = create_engine(f"duckdb:///{db_path}", future=True)
+        self.engine = _create_engine(db_path)
         self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False, future=True)
         self.init_db()
+        # Warm the student id set so the first /call doesn't pay for the load
+        try:
+            self._cached_student_ids()
+        except Exception as e:
+            logging.debug(f"Could not preload student ids: {e}")
 
     def init_db(self) -> None:
         """Create tables if missing and apply basic migrations.
@@ -108,101 +261,75 @@ class Storage:
                             os.remove(wal)
                         except Exception:
                             pass
-                    # Recreate engine and init
-                    self.engine = create_engine(f"duckdb:///{db_path}", future=True)
+                    # Close pooled connections to the old file, then recreate engine and init
+                    self.engine.dispose()
+                    self.engine = _create_engine(db_path)
                     self.SessionLocal.configure(bind=self.engine)
                     Base.metadata.create_all(self.engine)
                 except Exception:
                     raise
             else:
                 raise
-        # Basic migration: add columns if missing
+        # Basic migration: add columns if missing (idempotent, no schema probe needed)
         try:
-            with self.engine.connect() as conn:
-                cols = conn.exec_driver_sql("PRAGMA table_info('logs')").fetchall()
-                names = {row[1] for row in cols} if cols else set()
-                if 'experiment_name' not in names:
-                    conn.exec_driver_sql("ALTER TABLE logs ADD COLUMN experiment_name VARCHAR NULL")
-                if 'trial' not in names:
-                    conn.exec_driver_sql("ALTER TABLE logs ADD COLUMN trial VARCHAR NULL")
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("ALTER TABLE logs ADD COLUMN IF NOT EXISTS experiment_name VARCHAR NULL")
+                conn.exec_driver_sql("ALTER TABLE logs ADD COLUMN IF NOT EXISTS trial VARCHAR NULL")
+            self._schema_migrated = True
+        except Exception:
+            # Best-effort migration; log writes may retry it once on a missing-column error
+            pass
+        # Drop indexes created by older schemas (see Log)
+        try:
+            with self.engine.begin() as conn:
+                conn.exec_driver_sql("DROP INDEX IF EXISTS ix_logs_ts")
+                conn.exec_driver_sql("DROP INDEX IF EXISTS ix_logs_func_name")
         except Exception:
-            # Best-effort migration; ignore if PRAGMA not supported or other errors
             pass
 
     def add_student(self, student_id: str, name: str, email: Optional[str] = None) -> None:
-        """Idempotent insert of a student using proper UPSERT to prevent race conditions."""
-        with self.SessionLocal() as s:
-            try:
-                # Try to insert new student
-                new_student = Student(student_id=student_id, name=name, email=email)
-                s.add(new_student)
-                s.commit()
-                logging.debug(f"Added new student: {student_id}")
-            except Exception as e:
-                s.rollback()
-                # Check if student already exists (likely cause of constraint violation)
-                existing = s.get(Student, student_id)
-                if existing:
-                    logging.debug(f"Student {student_id} already exists, skipping insert")
-                    return  # Student exists, which is fine
-                else:
-                    # Some other error occurred
-                    logging.error(f"Failed to add student {student_id}: {e}")
-                    raise
+        """Idempotent insert of a student (single INSERT OR IGNORE statement)."""
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(
+                    insert(Student).prefix_with("OR IGNORE"),
+                    {"student_id": student_id, "name": name, "email": email},
+                )
+        except Exception as e:
+            logging.error(f"Failed to add student {student_id}: {e}")
+            raise
+        # Exists now, whether just inserted or already there
+        self._update_student_ids(added=(student_id,))
+        logging.debug(f"Added student (or already present): {student_id}")
 
     def add_students_bulk(self, students: List[Dict[str, str]]) -> Dict[str, Any]:
-        """Bulk insert students efficiently, skipping duplicates."""
+        """Bulk insert students in one statement, skipping existing ids (INSERT OR IGNORE)."""
+        errors = []
+        rows = []
+        for student_data in students:
+            student_id = student_data.get('student_id', '').strip()
+            if not student_id:
+                errors.append("Missing or empty student_id")
+                continue
+            rows.append({
+                "student_id": student_id,
+                "name": student_data.get('name', '').strip(),
+                "email": student_data.get('email', '').strip() or None,
+            })
+
         added_count = 0
         skipped_count = 0
-        errors = []
-        
-        with self.SessionLocal() as s:
-            # Get existing student IDs to avoid conflicts
-            existing_ids = set()
-            try:
-                existing_students = s.execute(select(Student.student_id)).scalars().all()
-                existing_ids = set(existing_students)
-            except Exception as e:
-                logging.warning(f"Could not check existing students: {e}")
-            
-            # Filter out students that already exist
-            new_students = []
-            for student_data in students:
-                student_id = student_data.get('student_id', '').strip()
-                if not student_id:
-                    errors.append("Missing or empty student_id")
-                    continue
-                
-                if student_id in existing_ids:
-                    skipped_count += 1
-                    continue
-                
-                new_students.append(Student(
-                    student_id=student_id,
-                    name=student_data.get('name', '').strip(),
-                    email=student_data.get('email', '').strip() or None
-                ))
-            
-            # Bulk insert new students
-            if new_students:
-                try:
-                    s.add_all(new_students)
-                    s.commit()
-                    added_count = len(new_students)
-                    logging.info(f"Bulk added {added_count} students")
-                except Exception as e:
-                    s.rollback()
-                    # Fallback to individual inserts if bulk fails
-                    logging.warning(f"Bulk insert failed, falling back to individual inserts: {e}")
-                    for student in new_students:
-                        try:
-                            s.add(student)
-                            s.commit()
-                            added_count += 1
-                        except Exception as individual_error:
-                            s.rollback()
-                            errors.append(f"Failed to add {student.student_id}: {individual_error}")
-        
+        if rows:
+            added_count, failed = self._insert_students(rows)
+            for row, err in failed:
+                errors.append(f"Failed to add {row['student_id']}: {err}")
+            skipped_count = len(rows) - added_count - len(failed)
+            if added_count:
+                # Every id that didn't fail exists now, whether inserted or ignored
+                failed_ids = {row["student_id"] for row, _ in failed}
+                self._update_student_ids(added=tuple(r["student_id"] for r in rows if r["student_id"] not in failed_ids))
+                logging.info(f"Bulk added {added_count} students")
+
         return {
             "added": added_count,
             "skipped": skipped_count,
@@ -210,60 +337,160 @@ class Storage:
             "total_processed": len(students)
         }
 
+    def _insert_students(self, rows: List[Dict[str, Any]]) -> tuple[int, List[tuple[Dict[str, Any], Exception]]]:
+        """INSERT OR IGNORE ``rows`` in one transaction; returns (added, failed rows).
+
+        If the statement fails, bisect and retry each half so a bad row costs
+        O(log N) extra transactions instead of one per row.
+        """
+        count_stmt = _COUNT_STUDENTS
+        try:
+            with self.engine.begin() as conn:
+                before = conn.execute(count_stmt).scalar_one()
+                conn.execute(insert(Student).prefix_with("OR IGNORE").values(rows))
+                return conn.execute(count_stmt).scalar_one() - before, []
+        except Exception as e:
+            if len(rows) == 1:
+                logging.error(f"Failed to add student {rows[0]['student_id']}: {e}")
+                return 0, [(rows[0], e)]
+        mid = len(rows) // 2
+        added_a, failed_a = self._insert_students(rows[:mid])
+        added_b, failed_b = self._insert_students(rows[mid:])
+        return added_a + added_b, failed_a + failed_b
+
+    def _update_student_ids(self, *, added: tuple = (), removed: tuple = ()) -> None:
+        """Apply a committed add/delete to the cached id set in place (no re-read)."""
+        with self._student_ids_lock:
+            # Bump the generation so an in-flight refresh can't publish a stale snapshot
+            self._student_ids_gen += 1
+            self._students_body = None
+            ids = self._student_ids
+            if ids is not None:
+                ids.update(added)
+                ids.difference_update(removed)
+
+    def _cached_student_ids(self) -> set[str]:
+        ids = self._student_ids
+        if ids is not None and time.monotonic() - self._student_ids_at < self.STUDENT_CACHE_TTL:
+            return ids
+        gen = self._student_ids_gen
+        with self.engine.connect() as conn:
+            ids = set(conn.execute(_SELECT_STUDENT_IDS).scalars())
+        with self._student_ids_lock:
+            # Don't publish a snapshot that raced with an add/delete
+            if gen == self._student_ids_gen:
+                self._student_ids = ids
+                self._student_ids_at = time.monotonic()
+        return ids
+
     def student_exists(self, student_id: str) -> bool:
-        with self.SessionLocal() as s:
-            return s.get(Student, student_id) is not None
+        """In-memory membership check against the cached student id set."""
+        return student_id in self._cached_student_ids()
 
     def list_students(self) -> List[Dict[str, Any]]:
         """Returns a list of all registered students."""
-        with self.SessionLocal() as s:
-            students = s.execute(select(Student).order_by(Student.student_id)).scalars().all()
-            logging.info(f"Found {len(students)} students in the database.")
-            return [
-                {"student_id": s.student_id, "name": s.name, "email": s.email}
-                for s in students
-            ]
+        with self.engine.connect() as conn:
+            rows = conn.execute(_SELECT_STUDENTS).all()
+        logging.info(f"Found {len(rows)} students in the database.")
+        return [
+            {"student_id": student_id, "name": name, "email": email}
+            for student_id, name, email in rows
+        ]
+
+    def students_json(self) -> bytes:
+        """``{"students": list_students()}`` as JSON, kept until a student is added or deleted."""
+        body = self._students_body
+        if body is None:
+            gen = self._student_ids_gen
+            body = orjson.dumps({"students": self.list_students()})
+            with self._student_ids_lock:
+                if gen == self._student_ids_gen:
+                    self._students_body = body
+        return body
 
     def delete_student(self, student_id: str) -> bool:
         """Deletes a student and all their associated logs. Returns True if deleted, False otherwise."""
-        with self.SessionLocal() as s:
-            student = s.get(Student, student_id)
-            if student:
-                # Delete logs first
-                s.execute(delete(Log).where(Log.student_id == student_id))
-                # Then delete the student
-                s.delete(student)
-                s.commit()
-                return True
-            return False
+        with self.engine.begin() as conn:
+            # DELETE ... RETURNING doubles as the existence check
+            deleted = conn.execute(
+                delete(Student).where(Student.student_id == student_id).returning(Student.student_id)
+            ).first()
+            if deleted is None:
+                return False
+            conn.execute(delete(Log).where(Log.student_id == student_id))
+        self._update_student_ids(removed=(student_id,))
+        self._invalidate_logs_cache()
+        self._invalidate_log_options()
+        return True
 
     def delete_logs_by_student(self, student_id: str) -> int:
         """Deletes all logs for a given student_id. Returns number of rows deleted."""
         with self.SessionLocal() as s:
             res = s.execute(delete(Log).where(Log.student_id == student_id))
             s.commit()
+            self._invalidate_logs_cache()
+            self._invalidate_log_options()
             # SQLAlchemy 2.0: result.rowcount may be None for some dialects; coerce to int
             return int(res.rowcount or 0)
 
-    def log_event(self, *, student_id: str, experiment_name: Optional[str], trial: Optional[str], func_name: str, args_json: str, result_json: Optional[str], error: Optional[str]) -> None:
-        with self.SessionLocal() as s:
-            s.add(Log(student_id=student_id, experiment_name=experiment_name, trial=trial, func_name=func_name, args_json=args_json, result_json=result_json, error=error))
-            try:
-                s.commit()
-            except Exception as e:
-                # If the DB is missing the experiment_name column (older schema), try to migrate on the fly once
-                msg = str(e).lower()
-                s.rollback()
-                if "experiment_name" in msg and "does not have a column" in msg:
-                    try:
-                        self.init_db()
-                        s.add(Log(student_id=student_id, experiment_name=experiment_name, trial=trial, func_name=func_name, args_json=args_json, result_json=result_json, error=error))
-                        s.commit()
-                        return
-                    except Exception:
-                        s.rollback()
-                # Re-raise original error if migration or retry didn't work
+    def log_event(self, *, student_id: str, experiment_name: Optional[str], trial: Optional[str], func_name: str, args_json: str, result_json: Optional[str], error: Optional[str], ts: Optional[datetime.datetime] = None) -> None:
+        """Insert one log row through the same pooled Core path as ``log_events_bulk``
+        (no ORM Session/unit of work), including its schema-migration retry."""
+        row = {
+            "student_id": student_id, "experiment_name": experiment_name, "trial": trial,
+            "func_name": func_name, "args_json": args_json, "result_json": result_json, "error": error,
+        }
+        if ts is not None:
+            row["ts"] = ts
+        self.log_events_bulk([row])
+
+    def log_events_bulk(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert many log rows (``log_event`` kwargs dicts) in one transaction.
+
+        Rows keep their own naive-UTC ``ts`` when they carry one (the time of the
+        call, not of the flush); the rest get the time of this write.
+
+        The batch is sent as one JSON document bound to a single parameter and
+        unpacked by DuckDB. DuckDB's Python client converts every bound value
+        individually, which made a 256-row ``VALUES`` insert ~20x slower.
+        """
+        if not rows:
+            return
+        now = _utcnow()
+        payload = orjson.dumps([{"ts": now, **row} for row in rows]).decode()
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(_INSERT_LOGS_FROM_JSON, {"rows": payload})
+        except Exception as e:
+            # Same one-shot migration retry as log_event for older schemas
+            msg = str(e).lower()
+            if not ("experiment_name" in msg and "does not have a column" in msg) or self._schema_migrated:
                 raise
+            self.init_db()
+            with self.engine.begin() as conn:
+                conn.execute(_INSERT_LOGS_FROM_JSON, {"rows": payload})
+        self._invalidate_logs_cache()
+        self._note_log_options([(r.get("student_id"), r.get("trial")) for r in rows])
+        self._batches_since_checkpoint += 1
+        if (self._batches_since_checkpoint >= self.CHECKPOINT_EVERY_BATCHES
+                or time.monotonic() - self._last_checkpoint >= self.CHECKPOINT_EVERY_SECONDS):
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Write the WAL into the database file."""
+        self._batches_since_checkpoint = 0
+        self._last_checkpoint = time.monotonic()
+        try:
+            with self.engine.connect() as conn:
+                conn.exec_driver_sql("CHECKPOINT")
+                conn.commit()
+        except Exception as e:
+            logging.warning(f"CHECKPOINT failed: {e}")
+
+    def _invalidate_logs_cache(self) -> None:
+        with self._logs_cache_lock:
+            self._logs_cache.clear()
+            self._logs_cache_gen += 1
 
     def fetch_logs(
         self,
@@ -276,74 +503,114 @@ class Storage:
         start_time: Optional[datetime.datetime] = None,
         end_time: Optional[datetime.datetime] = None,
     ) -> List[Dict[str, Any]]:
-        """Fetch logs with optional filtering, ordering, and limit."""
-        with self.SessionLocal() as s:
-            stmt = select(Log)
-
-            conditions = []
-            if student_id:
-                conditions.append(Log.student_id == student_id)
-            if experiment_name:
-                conditions.append(Log.experiment_name == experiment_name)
-            if trial:
-                conditions.append(Log.trial == trial)
-            if start_time:
-                conditions.append(Log.ts >= start_time)
-            if end_time:
-                conditions.append(Log.ts <= end_time)
-
-            if conditions:
-                stmt = stmt.where(and_(*conditions))
-
-            # Cap maximum rows returned to protect memory/latency. Increased to 10,000 per request.
-            stmt = stmt.order_by(desc(Log.ts) if order != "earliest" else asc(Log.ts)).limit(int(max(1, min(n, 10_000))))
-
-            # Log the compiled SQL for debugging
-            if logging.getLogger().hasHandlers():
-                try:
-                    compiled_stmt = stmt.compile(dialect=sqlite.dialect(), compile_kwargs={"literal_binds": True})
-                    logging.info(f"Generated SQL statement: {compiled_stmt}")
-                except Exception:
-                    pass
-
-            rows = s.execute(stmt).scalars().all()
+        """Fetch logs with optional filtering, ordering, and limit (briefly cached)."""
+        key = (student_id, experiment_name, trial, n, order, start_time, end_time)
+        now = time.monotonic()
+        hit = self._logs_cache.get(key)
+        if hit is not None and now - hit[0] < self.LOGS_CACHE_TTL:
+            return hit[1]
+        gen = self._logs_cache_gen
+        rows = self._query_logs(
+            student_id=student_id, experiment_name=experiment_name, trial=trial,
+            n=n, order=order, start_time=start_time, end_time=end_time,
+        )
+        with self._logs_cache_lock:
+            # Skip caching if a write landed while we were querying
+            if gen == self._logs_cache_gen:
+                if len(self._logs_cache) >= self.LOGS_CACHE_MAX:
+                    self._logs_cache.pop(next(iter(self._logs_cache)))
+                self._logs_cache[key] = (now, rows)
+        return rows
 
-            def _iso_ts(dt: datetime.datetime) -> str:
-                # Ensure timezone-aware ISO; assume stored UTC when naive
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=datetime.timezone.utc)
-                return dt.isoformat()
+    def _query_logs(
+        self,
+        *,
+        student_id: Optional[str],
+        experiment_name: Optional[str],
+        trial: Optional[str],
+        n: int,
+        order: str,
+        start_time: Optional[datetime.datetime],
+        end_time: Optional[datetime.datetime],
+    ) -> List[Dict[str, Any]]:
+        stmt = _logs_select(
+            bool(student_id), bool(experiment_name), bool(trial),
+            bool(start_time), bool(end_time), order == "earliest",
+        )
+        params = {
+            k: v for k, v in (
+                ("student_id", student_id), ("experiment_name", experiment_name), ("trial", trial),
+                ("start_time", _naive_utc(start_time)), ("end_time", _naive_utc(end_time)),
+            ) if v
+        }
+        # Cap maximum rows returned to protect memory/latency. Increased to 10,000 per request.
+        params["n"] = int(max(1, min(n, 10_000)))
 
-            def _try_parse_json(json_str: Optional[str]) -> Any:
-                if json_str is None:
-                    return None
-                try:
-                    return json.loads(json_str)
-                except json.JSONDecodeError:
-                    return json_str
+        with self.engine.connect() as conn:
+            # All selected columns are strings/None with no result processors, so read
+            # plain tuples off the DBAPI cursor instead of wrapping each in a Row.
+            rows = conn.execute(stmt, params).cursor.fetchall()
 
             return [
                 {
-                    "ts": _iso_ts(r.ts),
-                    "student_id": r.student_id,
-                    "experiment_name": r.experiment_name,
-                    "trial": r.trial,
-                    "func_name": r.func_name,
-                    "args_json": _try_parse_json(r.args_json),
-                    "result_json": _try_parse_json(r.result_json),
-                    "error": r.error,
+                    "ts": ts,
+                    "student_id": student_id,
+                    "experiment_name": experiment_name,
+                    "trial": trial,
+                    "func_name": func_name,
+                    "args_json": _try_parse_json(args_json),
+                    "result_json": _try_parse_json(result_json),
+                    "error": error,
                 }
-                for r in rows
+                for ts, student_id, experiment_name, trial, func_name, args_json, result_json, error in rows
             ]
 
+    def _invalidate_log_options(self) -> None:
+        with self._log_options_lock:
+            self._log_options = None
+            self._log_options_gen += 1
+
+    def _note_log_options(self, pairs: List[tuple]) -> None:
+        """Merge newly inserted (student_id, trial) pairs into the cached option sets."""
+        with self._log_options_lock:
+            if self._log_options is None:
+                return
+            students, trials = self._log_options
+            for student_id, trial in pairs:
+                if student_id:
+                    students.add(student_id)
+                if trial:
+                    trials.add(trial)
+
+    def log_options(self) -> tuple[List[str], List[str]]:
+        """Return ``(distinct_students_with_logs(), distinct_experiments())`` from memory."""
+        cached = self._log_options
+        if cached is None or time.monotonic() - self._log_options_at >= self.LOG_OPTIONS_TTL:
+            gen = self._log_options_gen
+            students, trials = self._scan_log_options()
+            with self._log_options_lock:
+                # Don't publish a snapshot that raced with a delete
+                if gen == self._log_options_gen:
+                    self._log_options = (students, trials)
+                    self._log_options_at = time.monotonic()
+            cached = (students, trials)
+        with self._log_options_lock:
+            return sorted(cached[0]), sorted(cached[1])
+
+    def _scan_log_options(self) -> tuple[set[str], set[str]]:
+        """Collect distinct student_ids and trials in a single scan of logs."""
+        with self.engine.connect() as conn:
+            students, trials = conn.execute(_SELECT_LOG_OPTIONS).one()
+        return {v for v in students or () if v}, {v for v in trials or () if v}
+
     def distinct_students_with_logs(self) -> List[str]:
         """Return distinct student_ids that have at least one log, sorted."""
-        with self.SessionLocal() as s:
-            rows = s.execute(select(distinct(Log.student_id)).order_by(asc(Log.student_id))).all()
+        with self.engine.connect() as conn:
+            rows = conn.execute(_SELECT_DISTINCT_STUDENTS).all()
             return [r[0] for r in rows if r and r[0]]
 
     def distinct_experiments(self) -> List[str]:
         """Return distinct non-null trial values from logs (compat as 'experiments')."""
-        with self.SessionLocal() as s:
-            rows = s.execute(select(distinct(Log.trial)).where(Log.trial.is_not(None)).order_by(asc(Log.trial))).all()
+        with self.engine.connect() as conn:
+            rows = conn.execute(_SELECT_DISTINCT_TRIALS).all()
             return [r[0] for r in rows if r and r[0]]
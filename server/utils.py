@@ -1,78 +1,336 @@
 from __future__ import annotations
 
-import glob
+import ast
+import functools
 import importlib.util
 import inspect
 import json
+import orjson
 import os
 from typing import Any, Callable, Dict, Optional
 import re
+import stat
+import weakref
+from types import FunctionType, ModuleType
 
 from fastapi.encoders import jsonable_encoder
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.sessions import SessionMiddleware
 from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, Response
 import logging
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from typing import Literal, Any, Optional, Dict
-from pydantic import BaseModel
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, model_validator
 import datetime
-try:
-    from .storage_orm import Storage  # when imported as package (server.utils)
-except ImportError:  # pragma: no cover
-    from storage_orm import Storage  # when imported as script (utils)
 import hashlib
 import hmac
 import os
 
 
-def enc(obj: Any) -> str:
-    """Best-effort JSON encoding for logging."""
+# Non-str dict keys and numpy arrays are encoded natively; anything else orjson
+# can't handle goes through jsonable_encoder via ``default``.
+ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+def enc_bytes(obj: Any) -> bytes:
+    """Best-effort JSON encoding to bytes; unencodable values become their repr."""
     try:
-        return json.dumps(jsonable_encoder(obj))
-    except Exception:
+        return orjson.dumps(obj, default=jsonable_encoder, option=ORJSON_OPTS)
+    except orjson.JSONEncodeError:
+        # orjson rejects e.g. ints wider than 64 bits; the stdlib encoder keeps them numbers
         try:
-            return json.dumps(repr(obj))
+            return json.dumps(jsonable_encoder(obj), separators=(",", ":")).encode()
         except Exception:
-            return 'null'
+            pass
+    except Exception:
+        pass
+    try:
+        return orjson.dumps(repr(obj))
+    except Exception:
+        return b'null'
 
 
-def resolve_log_filters(
-    *,
-    student_id: Optional[str], sid: Optional[str],
-    experiment_name: Optional[str], exp: Optional[str],
-    trial: Optional[str], trial_name: Optional[str],
-) -> tuple[Optional[str], Optional[str]]:
-    """Resolve query params for logs into effective student and trial."""
-    eff_student = student_id or sid
-    eff_trial = trial or trial_name or experiment_name or exp
-    return eff_student, eff_trial
+def enc(obj: Any) -> str:
+    """Best-effort JSON encoding for logging."""
+    return enc_bytes(obj).decode()
+
+
+# Epoch seconds for 0001-01-01 and 9999-12-31T23:59:59 UTC, the range datetime can hold
+_MIN_TS, _MAX_TS = -62_135_596_800, 253_402_300_799
+
+# Query keys that name the same LogQuery field; "" counts as not given
+_LOG_QUERY_ALIASES = frozenset(("student_id", "sid", "trial", "trial_name", "experiment_name", "exp"))
+
+
+class LogQuery(BaseModel):
+    """Query params for /logs; aliases are resolved by Pydantic in one parse step.
+
+    ``student_id`` also accepts ``sid``; ``trial`` accepts ``trial_name``,
+    ``experiment_name`` and ``exp`` (first non-empty wins, in that order).
+    The time window can be given as epoch seconds (``start_ts``/``end_ts``,
+    cheaper to validate) or ISO-8601 (``start_time``/``end_time``).
+    """
+    model_config = ConfigDict(populate_by_name=True, extra="ignore")
+
+    student_id: Optional[str] = Field(None, validation_alias=AliasChoices("student_id", "sid"))
+    trial: Optional[str] = Field(None, validation_alias=AliasChoices("trial", "trial_name", "experiment_name", "exp"))
+    n: int = Field(100, ge=1, le=10_000)
+    order: Literal["latest", "earliest"] = "latest"
+    start_ts: Optional[int] = Field(None, ge=_MIN_TS, le=_MAX_TS)
+    end_ts: Optional[int] = Field(None, ge=_MIN_TS, le=_MAX_TS)
+    start_time: Optional[datetime.datetime] = None
+    end_time: Optional[datetime.datetime] = None
+
+    @model_validator(mode="before")
+    @classmethod
+    def _drop_empty_aliases(cls, data: Any) -> Any:
+        """Treat empty alias values as absent, so ``?trial=&exp=t2`` filters on t2."""
+        if isinstance(data, dict) and any(data.get(k) == "" for k in _LOG_QUERY_ALIASES):
+            data = {k: v for k, v in data.items() if not (v == "" and k in _LOG_QUERY_ALIASES)}
+        return data
+
+    @property
+    def start(self) -> Optional[datetime.datetime]:
+        """Effective window start; ``start_ts`` wins over ``start_time``."""
+        if self.start_ts is not None:
+            return datetime.datetime.fromtimestamp(self.start_ts, tz=datetime.timezone.utc)
+        return self.start_time
+
+    @property
+    def end(self) -> Optional[datetime.datetime]:
+        """Effective window end; ``end_ts`` wins over ``end_time``."""
+        if self.end_ts is not None:
+            return datetime.datetime.fromtimestamp(self.end_ts, tz=datetime.timezone.utc)
+        return self.end_time
+
+
+_POSITIONAL_KINDS = (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+# Compiled ``w(args)`` wrappers are stored on the function under this name. A
+# weak-keyed cache would never evict them, since each wrapper references its fn.
+_CALL_WRAPPER_ATTR = "__leap_call__"
+
+
+def _compile_call_wrapper(fn: Callable[..., Any]) -> Callable[[list], Any]:
+    """Build ``w(args)`` calling ``fn`` positionally.
+
+    Fixed-arity functions (no defaults, no *args/**kwargs) get an exec-compiled
+    wrapper that checks the count up front and indexes ``args`` directly;
+    anything else falls back to ``fn(*args)``.
+    """
+    try:
+        params = list(inspect.signature(fn).parameters.values())
+    except (TypeError, ValueError):
+        params = None
+    if params is None or any(p.kind not in _POSITIONAL_KINDS or p.default is not p.empty for p in params):
+        return lambda a: fn(*a)
+    k = len(params)
+    src = (
+        "def w(a):\n"
+        f"    if len(a) != {k}:\n"
+        f"        raise TypeError(f'{{_n}}() takes {k} positional arguments but {{len(a)}} were given')\n"
+        f"    return _f({', '.join(f'a[{i}]' for i in range(k))})\n"
+    )
+    ns: Dict[str, Any] = {"_f": fn, "_n": getattr(fn, "__name__", "function")}
+    exec(src, ns)
+    return ns["w"]
+
+
+def get_call_wrapper(fn: Callable[..., Any]) -> Callable[[list], Any]:
+    """Return the cached call wrapper for ``fn``, compiling it on first use.
+
+    Only plain functions cache it (as an attribute, so it dies with ``fn``);
+    other callables get a fresh wrapper each time.
+    """
+    if type(fn) is not FunctionType:
+        return _compile_call_wrapper(fn)
+    w = fn.__dict__.get(_CALL_WRAPPER_ATTR)
+    if w is None:
+        w = _compile_call_wrapper(fn)
+        setattr(fn, _CALL_WRAPPER_ATTR, w)
+    return w
+
+
+# How /call should run a function: await it, hand it to the threadpool, or call inline
+CALL_ASYNC, CALL_THREAD, CALL_INLINE = "async", "thread", "inline"
+_CALL_MODES: "weakref.WeakKeyDictionary[Callable[..., Any], str]" = weakref.WeakKeyDictionary()
+
+
+def get_call_mode(fn: Callable[..., Any]) -> str:
+    """Classify ``fn`` once: coroutine functions are awaited, functions marked
+    ``fn.__leap_inline__ = True`` run on the event loop, the rest go to the threadpool."""
+    mode = _CALL_MODES.get(fn)
+    if mode is None:
+        if inspect.iscoroutinefunction(fn):
+            mode = CALL_ASYNC
+        elif getattr(fn, "__leap_inline__", False):
+            mode = CALL_INLINE
+        else:
+            mode = CALL_THREAD
+        _CALL_MODES[fn] = mode
+    return mode
+
+
+# fn -> {"signature", "doc"} as served by /functions
+_FN_METADATA: "weakref.WeakKeyDictionary[Callable[..., Any], Dict[str, str]]" = weakref.WeakKeyDictionary()
+
+
+def function_metadata(fn: Callable[..., Any]) -> Dict[str, str]:
+    """Return the cached /functions entry for ``fn`` (signature string and stripped doc)."""
+    meta = _FN_METADATA.get(fn)
+    if meta is None:
+        meta = _FN_METADATA[fn] = {
+            "signature": str(inspect.signature(fn)),
+            "doc": (fn.__doc__ or "").strip(),
+        }
+    return meta
+
+
+def describe_functions(registry: Dict[str, Callable[..., Any]]) -> Dict[str, Dict[str, str]]:
+    """Build the /functions payload from cached per-function metadata."""
+    return {name: function_metadata(fn) for name, fn in registry.items()}
+
+
+# filepath -> (mtime_ns, source digest, module); lets repeated loads skip re-exec of unchanged files
+_MODULE_CACHE: Dict[str, tuple[int, bytes, ModuleType]] = {}
+# filepath -> (mtime_ns, public top-level def names) from an AST scan (no exec)
+_DEF_INDEX_CACHE: Dict[str, tuple[int, list[str]]] = {}
+
+
+def _load_module(filepath: str, mtime: int) -> Optional[ModuleType]:
+    """Exec ``filepath`` as ``funcs.<name>``, reusing the cached module if unchanged.
+
+    A new mtime with identical source (touch, checkout, editor save) is still a hit.
+    """
+    cached = _MODULE_CACHE.get(filepath)
+    if cached and cached[0] == mtime:
+        return cached[2]
+    try:
+        with open(filepath, "rb") as f:
+            digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+    except OSError:
+        return None
+    if cached and cached[1] == digest:
+        _MODULE_CACHE[filepath] = (mtime, digest, cached[2])
+        return cached[2]
+    module_name = os.path.splitext(os.path.basename(filepath))[0]
+    spec = importlib.util.spec_from_file_location(f"funcs.{module_name}", filepath)
+    if not (spec and spec.loader):
+        return None
+    try:
+        mod = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(mod)
+    except Exception as e:
+        logging.error("Error loading module '%s' from '%s': %s", module_name, filepath, e)
+        return None
+    _MODULE_CACHE[filepath] = (mtime, digest, mod)
+    return mod
+
+
+def _register_function(fn: Callable[..., Any]) -> None:
+    """Precompute per-function call wrapper, call mode and /functions metadata."""
+    get_call_wrapper(fn)
+    get_call_mode(fn)
+    function_metadata(fn)
+
+
+def _public_defs(filepath: str, mtime: int) -> list[str]:
+    cached = _DEF_INDEX_CACHE.get(filepath)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(filepath, "rb") as f:
+            tree = ast.parse(f.read(), filepath)
+    except (OSError, SyntaxError, ValueError):
+        names = []
+    else:
+        names = [
+            node.name for node in tree.body
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith("_")
+        ]
+    _DEF_INDEX_CACHE[filepath] = (mtime, names)
+    return names
+
+
+def _iter_py_files(directory: str):
+    """Yield ``(path, mtime_ns)`` for ``*.py`` files in ``directory`` (same set as glob)."""
+    try:
+        with os.scandir(directory) as it:
+            for entry in it:
+                name = entry.name
+                if not name.endswith(".py") or name.startswith("."):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    yield entry.path, entry.stat().st_mtime_ns
+                except OSError:
+                    continue
+    except OSError:
+        return
 
 
 def load_functions_from_directory(directory: str) -> Dict[str, Callable[..., Any]]:
     funcs: Dict[str, Callable[..., Any]] = {}
-    for filepath in glob.glob(os.path.join(directory, "*.py")):
-        module_name = os.path.splitext(os.path.basename(filepath))[0]
-        spec = importlib.util.spec_from_file_location(f"funcs.{module_name}", filepath)
-        if spec and spec.loader:
-            try:
-                mod = importlib.util.module_from_spec(spec)
-                spec.loader.exec_module(mod)
-            except Exception as e:
-                print(f"Error loading module '{module_name}' from '{filepath}': {e}")
+    for filepath, mtime in _iter_py_files(directory):
+        mod = _load_module(filepath, mtime)
+        if mod is None:
+            continue
+        for name, obj in mod.__dict__.items():
+            if name.startswith("_"):
                 continue
-            for name, obj in vars(mod).items():
-                if name.startswith("_"):
-                    continue
-                if inspect.isfunction(obj):
-                    if name in funcs:
-                        print(f"Warning: Function '{name}' is being redefined in directory '{directory}'.")
-                    funcs[name] = obj
+            if type(obj) is FunctionType:
+                if name in funcs:
+                    logging.warning("Function '%s' is being redefined in directory '%s'.", name, directory)
+                funcs[name] = obj
+                _register_function(obj)
     if not funcs:
-        print(f"Warning: No public functions found in directory '{directory}'.")
+        logging.warning("No public functions found in directory '%s'.", directory)
     return funcs
 
 
+# (directory, name) -> (directory mtime_ns, owner path, owner mtime_ns, fn)
+_RESOLVED: Dict[tuple[str, str], tuple[int, str, int, Callable[..., Any]]] = {}
+
+
+def resolve_function(directory: str, name: str) -> Optional[Callable[..., Any]]:
+    """Return public function ``name`` from ``directory``, executing only the module
+    whose source defines it (located by a cached AST scan).
+
+    A previous resolution is reused while neither the directory (files added,
+    removed or renamed) nor the owning file has changed, so the steady state is
+    two ``stat`` calls rather than a directory scan.
+
+    Names not bound by a top-level ``def`` (e.g. re-exported imports) fall back to
+    a full ``load_functions_from_directory``.
+    """
+    key = (directory, name)
+    try:
+        dir_mtime = os.stat(directory).st_mtime_ns
+    except OSError:
+        dir_mtime = None
+    hit = _RESOLVED.get(key)
+    if hit is not None and hit[0] == dir_mtime:
+        try:
+            if os.stat(hit[1]).st_mtime_ns == hit[2]:
+                return hit[3]
+        except OSError:
+            pass
+    owner = None
+    for filepath, mtime in _iter_py_files(directory):
+        if name in _public_defs(filepath, mtime):
+            owner = (filepath, mtime)  # last definition wins, as in a full load
+    if owner is not None:
+        mod = _load_module(*owner)
+        fn = getattr(mod, name, None)
+        if type(fn) is FunctionType:
+            _register_function(fn)
+            if dir_mtime is not None:
+                _RESOLVED[key] = (dir_mtime, owner[0], owner[1], fn)
+            return fn
+    return load_functions_from_directory(directory).get(name)
+
+
 def _pbkdf2(password: str, salt: bytes, iterations: int = 240_000, algo: str = "sha256") -> bytes:
     return hashlib.pbkdf2_hmac(algo, password.encode("utf-8"), salt, iterations)
 
@@ -86,6 +344,9 @@ def make_password_hash(password: str, *, iterations: int = 240_000, algo: str =
         "password_hash": dk.hex(),
     }
 
+# Salt for the stand-in derivation when a credential record is unusable
+_DUMMY_SALT = b"\x00" * 16
+
 def _build_verifier_from_record(record: Dict[str, Any]):
     algo = record.get("algorithm", "pbkdf2_sha256")
     if not algo.startswith("pbkdf2_"):
@@ -103,18 +364,37 @@ def _build_verifier_from_record(record: Dict[str, Any]):
     except Exception:
         salt, pwd_hash = b"", b""
 
-    def verify(pw: str) -> bool:
+    # Keyed digest of the last password that completed a login, so repeat logins
+    # skip PBKDF2. Only full successes are remembered and only consulted when the
+    # username matched too; every failed login pays exactly one full derivation.
+    probe_key = os.urandom(32)
+    last_good: Optional[bytes] = None
+
+    def verify(pw: str, user_ok: bool = True) -> bool:
+        """Return True if ``user_ok`` and ``pw`` matches; pass the username check as ``user_ok``."""
+        nonlocal last_good
         if not salt or not pwd_hash:
+            # No usable record: still pay for a derivation so the reply time
+            # doesn't reveal that nothing is configured
+            _pbkdf2(pw, _DUMMY_SALT, iterations, "sha256")
             return False
+        probe = hmac.new(probe_key, pw.encode("utf-8"), "sha256").digest()
+        if user_ok and last_good is not None and hmac.compare_digest(probe, last_good):
+            return True
         dk = _pbkdf2(pw, salt, iterations, algo_name)
-        return hmac.compare_digest(dk, pwd_hash)
+        if user_ok and hmac.compare_digest(dk, pwd_hash):
+            last_good = probe
+            return True
+        return False
 
     return verify
 
+@functools.lru_cache(maxsize=None)
 def load_admin_credentials(admin_creds_path: str = None) -> tuple[str, callable]:
     """Return (username, verify_fn) for admin auth.
     
     Automatically migrates plaintext passwords to hashed format when detected.
+    Results are cached per path for the life of the process (restart to pick up edits).
 
     - Supports env ADMIN_USERNAME/ADMIN_PASSWORD (hashed in-memory)
     - JSON file supports:
@@ -135,87 +415,213 @@ def load_admin_credentials(admin_creds_path: str = None) -> tuple[str, callable]
         admin_creds_path = os.path.join(project_root, "admin_credentials.json")
 
     try:
-        if os.path.isfile(admin_creds_path):
-            with open(admin_creds_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            if isinstance(data, dict):
-                username = data.get("username") or data.get("user") or "admin"
+        try:
+            with open(admin_creds_path, "rb") as f:
+                data = orjson.loads(f.read())
+        except FileNotFoundError:
+            data = None
+        if isinstance(data, dict):
+            username = data.get("username") or data.get("user") or "admin"
+            
+            # Check if already hashed
+            if data.get("password_hash") and data.get("salt"):
+                return username, _build_verifier_from_record(data)
+            
+            # Auto-migrate plaintext password to hashed format
+            password = data.get("password") or data.get("pass")
+            if password:
+                logging.info("Migrating plaintext password to hashed format for: %s", admin_creds_path)
+                rec = make_password_hash(password)
                 
-                # Check if already hashed
-                if data.get("password_hash") and data.get("salt"):
-                    return username, _build_verifier_from_record(data)
+                # Create new hashed credentials
+                hashed_data = {"username": username, **rec}
                 
-                # Auto-migrate plaintext password to hashed format
-                password = data.get("password") or data.get("pass")
-                if password:
-                    print(f"🔐 Migrating plaintext password to hashed format for: {admin_creds_path}")
-                    rec = make_password_hash(password)
-                    
-                    # Create new hashed credentials
-                    hashed_data = {
-                        "username": username,
-                        "algorithm": rec["algorithm"],
-                        "iterations": rec["iterations"],
-                        "salt": rec["salt"],
-                        "password_hash": rec["password_hash"]
-                    }
-                    
-                    # Write back to file securely
-                    try:
-                        with open(admin_creds_path, "w", encoding="utf-8") as f:
-                            json.dump(hashed_data, f, indent=2)
-                        print(f"✅ Password migration completed for: {admin_creds_path}")
-                    except Exception as e:
-                        print(f"⚠️  Could not write hashed credentials to {admin_creds_path}: {e}")
-                        print("   Continuing with in-memory hash (password will need migration again next time)")
-                    
-                    return username, _build_verifier_from_record(rec)
+                # Write back to file securely
+                try:
+                    with open(admin_creds_path, "wb") as f:
+                        f.write(orjson.dumps(hashed_data, option=orjson.OPT_INDENT_2))
+                    logging.info("Password migration completed for: %s", admin_creds_path)
+                except Exception as e:
+                    logging.warning(
+                        "Could not write hashed credentials to %s: %s. Continuing with in-memory hash "
+                        "(password will need migration again next time)", admin_creds_path, e,
+                    )
                 
-                return username, (lambda _pw: False)
+                return username, _build_verifier_from_record(rec)
+            
+            # No password configured: never matches, but still costs a derivation
+            return username, _build_verifier_from_record({})
     except Exception as e:
-        print(f"⚠️  Error loading credentials from {admin_creds_path}: {e}")
-        pass
+        logging.warning("Error loading credentials from %s: %s", admin_creds_path, e)
     
     # Default dev creds (weak) — recommend overriding in production
-    print("🔓 Using default development credentials (admin/password) - change for production!")
+    logging.warning("Using default development credentials (admin/password) - change for production!")
     rec = make_password_hash("password")
     return "admin", _build_verifier_from_record(rec)
 
 
-class NoCacheHTMLMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        ct = response.headers.get('content-type', '')
-        path = request.url.path
-        if 'text/html' in ct and (path.startswith('/ui') or path.startswith('/exp/') or path == '/'):
-            response.headers['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
-        return response
+class LeanCORSMiddleware:
+    """Pure-ASGI CORS for credentialed browser clients.
+
+    Preflights are answered directly without reaching the app; other requests
+    get precomputed ``Access-Control-*`` headers appended at
+    ``http.response.start``. The request origin is echoed (never ``*``) since
+    cookies are allowed.
+    """
+
+    _ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+
+    def __init__(self, app, *, allow_origins=("*",), allow_credentials: bool = True, max_age: int = 600):
+        self.app = app
+        self.allow_all = "*" in allow_origins
+        self.allow_origins = frozenset(o.encode("latin-1") for o in allow_origins)
+        self._common = [(b"vary", b"Origin")]
+        if allow_credentials:
+            self._common.append((b"access-control-allow-credentials", b"true"))
+        self._preflight = [
+            *self._common,
+            (b"access-control-allow-methods", self._ALLOW_METHODS),
+            (b"access-control-max-age", str(max_age).encode("latin-1")),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        origin = req_method = req_headers = None
+        for key, value in scope["headers"]:
+            if key == b"origin":
+                origin = value
+            elif key == b"access-control-request-method":
+                req_method = value
+            elif key == b"access-control-request-headers":
+                req_headers = value
+        if origin is None:
+            return await self.app(scope, receive, send)
+        allowed = self.allow_all or origin in self.allow_origins
+
+        if scope["method"] == "OPTIONS" and req_method is not None:
+            if not allowed:
+                await send({"type": "http.response.start", "status": 400, "headers": [(b"content-type", b"text/plain; charset=utf-8")]})
+                await send({"type": "http.response.body", "body": b"Disallowed CORS origin"})
+                return
+            headers = [(b"access-control-allow-origin", origin), *self._preflight]
+            if req_headers:
+                headers.append((b"access-control-allow-headers", req_headers))
+            await send({"type": "http.response.start", "status": 204, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not allowed:
+            return await self.app(scope, receive, send)
+        cors_headers = [(b"access-control-allow-origin", origin), *self._common]
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", ()), *cors_headers]
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+
+class PathScopedSessionMiddleware:
+    """Run ``SessionMiddleware`` only for paths under ``prefixes``.
+
+    Public routes (``/call``, ``/logs``, ...) never touch ``request.session``, so
+    they skip signed-cookie verification and decoding entirely.
+    """
+
+    def __init__(self, app, *, prefixes, **session_kw):
+        self.app = app
+        self.session_app = SessionMiddleware(app, **session_kw)
+        self.prefixes = tuple(prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] in ("http", "websocket") and scope["path"].startswith(self.prefixes):
+            return await self.session_app(scope, receive, send)
+        return await self.app(scope, receive, send)
+
+
+class NoCacheHTMLMiddleware:
+    """Mark HTML pages under ``/``, ``/ui`` and ``/exp/`` as uncacheable (pure ASGI)."""
+
+    _NO_CACHE_HEADERS = (
+        (b"cache-control", b"no-store, no-cache, must-revalidate, max-age=0"),
+        (b"pragma", b"no-cache"),
+        (b"expires", b"0"),
+    )
+    _REPLACED = frozenset(k for k, _ in _NO_CACHE_HEADERS)
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        if not (path.startswith('/ui') or path.startswith('/exp/') or path == '/'):
+            return await self.app(scope, receive, send)
+
+        async def send_no_cache(message):
+            if message["type"] == "http.response.start":
+                headers = message.get("headers", ())
+                if any(k == b"content-type" and b"text/html" in v for k, v in headers):
+                    message["headers"] = [
+                        *((k, v) for k, v in headers if k not in self._REPLACED),
+                        *self._NO_CACHE_HEADERS,
+                    ]
+            await send(message)
+
+        await self.app(scope, receive, send_no_cache)
+
+class ActiveExperimentUIGuard:
+    """Redirect to the landing page while this experiment is not the active one (pure ASGI)."""
 
-class ActiveExperimentUIGuard(BaseHTTPMiddleware):
     def __init__(self, app, *, experiment_name: str, current_active: callable):
-        super().__init__(app)
+        self.app = app
         self.experiment_name = experiment_name
         self.current_active = current_active
 
-    async def dispatch(self, request, call_next):
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
         try:
-            path = request.url.path or ''
-            active = self.current_active()
-            # The middleware sees full paths like /exp/<experiment>/admin/login, not relative paths
-            is_admin_path = f'/exp/{self.experiment_name}/admin' in path
-            
+            path = scope["path"]
+            # The middleware sees full paths like /exp/<experiment>/admin/login; root_path
+            # is the mount prefix, so admin endpoints start with /admin right after it
+            is_admin_path = path.startswith('/admin', len(scope.get("root_path", "")))
+
             # Block all access when experiment is not active, except admin endpoints for authentication
             if not is_admin_path:
-                logging.debug(f"ActiveExperimentUIGuard: path={path}, experiment={self.experiment_name}, active={active}")
+                active = self.current_active()
+                logging.debug("ActiveExperimentUIGuard: path=%s, experiment=%s, active=%s", path, self.experiment_name, active)
                 if active != self.experiment_name:
-                    logging.info(f"Blocking access to {self.experiment_name} - not active (active: {active})")
-                    from starlette.responses import RedirectResponse
-                    return RedirectResponse(url='/', status_code=307)
+                    logging.info("Blocking access to %s - not active (active: %s)", self.experiment_name, active)
+                    return await send_redirect_to_landing(send)
         except Exception as e:
             logging.warning(f"ActiveExperimentUIGuard exception for {self.experiment_name}: {e}")
-        return await call_next(request)
+        await self.app(scope, receive, send)
+
+
+async def send_redirect_to_landing(send) -> None:
+    """Send a bare 307 to ``/`` without building a RedirectResponse."""
+    await send({"type": "http.response.start", "status": 307,
+                "headers": [(b"location", b"/"), (b"content-length", b"0")]})
+    await send({"type": "http.response.body", "body": b""})
+
+
+# Fixed admin replies, encoded once
+_LOGIN_OK_BODY = enc_bytes({"message": "Login successful"})
+_LOGOUT_BODY = enc_bytes({"message": "Logged out"})
+_PING_OK_BODY = enc_bytes({"ok": True})
+_NO_FILES_BODY = enc_bytes({"files": []})
+# /files ?dir= must be a single plain path segment
+_SAFE_DIR_RE = re.compile(r"[A-Za-z0-9_-]+")
+# /files listings kept per app; ext is client-supplied, so cap the distinct keys
+_FILES_CACHE_MAX = 64
+
+
+def _json_bytes_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
 
 
 def build_experiment_app(
@@ -225,7 +631,6 @@ def build_experiment_app(
     session_secret: str,
     session_cookie_opts: dict,
     current_active: callable,
-    invoke_and_log: callable,
 ) -> FastAPI:
     """Factory to build a per‑experiment FastAPI app with identical behavior.
 
@@ -235,26 +640,24 @@ def build_experiment_app(
     if not os.path.isdir(experiment_dir):
         return None
 
-    db_path = os.path.join(experiment_dir, "db/students.db")
-    if not os.path.exists(db_path):
-        logging.info("Database file not found at %s. A new one will be created.", db_path)
-    funcs_dir = os.path.join(experiment_dir, "funcs")
     ui_dir = os.path.join(experiment_dir, "ui")
     # No longer using per-experiment credentials
 
-    logging.debug("Creating app for experiment '%s' with db_path: %s", experiment_name, db_path)
-    storage = Storage(db_path)
-    function_registry = load_functions_from_directory(funcs_dir)
+    # Nothing here touches the DB or funcs/: the root APIs open the experiment's
+    # Storage on first use and /call resolves (and execs) only the module it needs.
+    logging.debug("Creating app for experiment '%s'", experiment_name)
 
-    app = FastAPI(title=f"Experiment: {experiment_name}")
+    app = FastAPI(title=f"Experiment: {experiment_name}", default_response_class=ORJSONResponse)
     app.mount("/ui", StaticFiles(directory=ui_dir), name="ui")
-    app.add_middleware(NoCacheHTMLMiddleware)
+    # No NoCacheHTMLMiddleware here: the parent app's instance already sees the full
+    # /exp/<name>/... path and the response of every mounted app.
     app.add_middleware(ActiveExperimentUIGuard, experiment_name=experiment_name, current_active=current_active)
     app.add_middleware(SessionMiddleware, secret_key=session_secret, **session_cookie_opts)
 
     # Use global admin credentials for all experiments
     # Session cookie is shared (path=/), so logging in here authenticates root admin APIs.
     ADMIN_USERNAME, ADMIN_VERIFY = load_admin_credentials()
+    ADMIN_USERNAME_B = ADMIN_USERNAME.encode("utf-8")
 
     @app.post("/admin/login")
     async def login(request: Request):
@@ -272,25 +675,31 @@ def build_experiment_app(
                 password = form.get("password")
             except Exception:
                 pass
-        if username == ADMIN_USERNAME and ADMIN_VERIFY(password or ""):
+        # The verifier runs even when the username is wrong, so both fail in the same time
+        user_ok = isinstance(username, str) and hmac.compare_digest(username.encode("utf-8"), ADMIN_USERNAME_B)
+        # PBKDF2 is CPU-bound; keep it off the event loop
+        if await run_in_threadpool(ADMIN_VERIFY, password or "", user_ok):
             # Set global authentication flag instead of per-experiment
             request.session["authenticated"] = True
-            return {"message": "Login successful"}
+            return _json_bytes_response(_LOGIN_OK_BODY)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     @app.post("/admin/logout")
     async def logout(request: Request, response: Response):
         # Clear global authentication
         request.session.clear()
-        return {"message": "Logged out"}
+        return _json_bytes_response(_LOGOUT_BODY)
 
     @app.get("/admin/ping")
     async def admin_ping(request: Request):
         if request.session.get("authenticated"):
-            return {"ok": True}
+            return _json_bytes_response(_PING_OK_BODY)
         # Not authenticated
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
 
+    # (base_dir, ext) -> (directory mtime_ns, encoded {"files": [...]} body)
+    files_cache: Dict[tuple[str, Optional[str]], tuple[int, bytes]] = {}
+
     @app.get("/files")
     def list_files(ext: Optional[str] = Query(None), dir: Optional[str] = Query(None)):
         """List files in the experiment's UI directory.
@@ -298,33 +707,38 @@ def build_experiment_app(
         - Query params:
           - ext: optional file extension filter (e.g., "md" or ".md").
           - dir: optional subdirectory under UI (e.g., "quiz"). Single segment only.
+
+        Listings are cached until the directory's mtime changes (entry added/removed/renamed).
         """
-        files: list[str] = []
+        norm_ext = (ext if ext.startswith(".") else f".{ext}").lower() if ext else None
+        base_dir = ui_dir
+        if dir:
+            # allow only a safe single-segment directory name to avoid traversal
+            if not _SAFE_DIR_RE.fullmatch(dir):
+                return _json_bytes_response(_NO_FILES_BODY)
+            base_dir = os.path.join(ui_dir, dir)
         try:
-            norm_ext = None
-            if ext:
-                norm_ext = ext if ext.startswith(".") else f".{ext}"
-                norm_ext = norm_ext.lower()
-            base_dir = ui_dir
-            if dir:
-                # allow only a safe single-segment directory name to avoid traversal
-                if not re.match(r"^[A-Za-z0-9_-]+$", dir or ""):
-                    return {"files": []}
-                cand = os.path.join(ui_dir, dir)
-                if os.path.isdir(cand):
-                    base_dir = cand
-                else:
-                    return {"files": []}
-            for name in os.listdir(base_dir):
-                if norm_ext:
-                    if name.lower().endswith(norm_ext):
-                        files.append(name)
-                else:
-                    files.append(name)
-        except Exception:
-            pass
+            st = os.stat(base_dir)
+        except OSError:
+            return _json_bytes_response(_NO_FILES_BODY)
+        if not stat.S_ISDIR(st.st_mode):
+            return _json_bytes_response(_NO_FILES_BODY)
+        key = (base_dir, norm_ext)
+        hit = files_cache.get(key)
+        if hit is not None and hit[0] == st.st_mtime_ns:
+            return _json_bytes_response(hit[1])
+
+        try:
+            with os.scandir(base_dir) as it:
+                files = [e.name for e in it if not norm_ext or e.name.lower().endswith(norm_ext)]
+        except OSError:
+            files = []
         files.sort()
-        return {"files": files}
+        body = enc_bytes({"files": files})
+        if len(files_cache) >= _FILES_CACHE_MAX:
+            files_cache.clear()
+        files_cache[key] = (st.st_mtime_ns, body)
+        return _json_bytes_response(body)
 
     # Note: other per-experiment APIs are intentionally omitted to avoid tight coupling.
     # All client/admin operations (students/logs/call) are provided at root and scoped to the active experiment.
@@ -0,0 +1,117 @@
+"""Shared fixtures.
+
+The server resolves experiments, landing pages and credentials relative to its
+own file and creates DuckDB files under ``experiments/<name>/db``. To keep the
+repo untouched, the ``server`` package is copied into a temporary project with
+a single ``testlab`` experiment and imported from there.
+"""
+import importlib
+import os
+import shutil
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TESTLAB_FUNCS = '''
+import threading
+
+# Set by tests: entered when wait_for_release starts, release to let it return
+entered = threading.Event()
+release = threading.Event()
+
+
+def echo(value):
+    """Return the input value unchanged."""
+    return value
+
+
+def add(a, b):
+    return a + b
+
+
+def wait_for_release(timeout):
+    entered.set()
+    return release.wait(timeout)
+
+
+def fail():
+    raise RuntimeError("boom")
+'''
+
+ADMIN_USERNAME = "admin"
+ADMIN_PASSWORD = "test-password"
+
+
+@pytest.fixture(scope="session")
+def project_root(tmp_path_factory):
+    root = tmp_path_factory.mktemp("leap")
+    shutil.copytree(
+        os.path.join(REPO_ROOT, "server"), root / "server",
+        ignore=shutil.ignore_patterns("__pycache__"),
+    )
+    lab = root / "experiments" / "testlab"
+    (lab / "funcs").mkdir(parents=True)
+    (lab / "ui").mkdir()
+    (lab / "funcs" / "functions.py").write_text(TESTLAB_FUNCS)
+    (lab / "ui" / "index.html").write_text("<html><body>testlab</body></html>")
+    return root
+
+
+@pytest.fixture(scope="session")
+def rpc(project_root):
+    """The ``server.rpc_server`` module imported from the temporary project."""
+    env = {
+        "SESSION_SECRET_KEY": "x" * 32,
+        "ADMIN_USERNAME": ADMIN_USERNAME,
+        "ADMIN_PASSWORD": ADMIN_PASSWORD,
+    }
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    sys.path.insert(0, str(project_root))
+    try:
+        yield importlib.import_module("server.rpc_server")
+    finally:
+        sys.path.remove(str(project_root))
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+@pytest.fixture
+def client(rpc):
+    """A TestClient (lifespan running) with no active experiment."""
+    from fastapi.testclient import TestClient
+
+    rpc._server_state.set_active_experiment(None)
+    with TestClient(rpc.app) as c:
+        yield c
+    rpc._server_state.set_active_experiment(None)
+
+
+@pytest.fixture
+def admin(client):
+    """``client`` logged in as admin with ``testlab`` active."""
+    r = client.post("/admin/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    assert r.status_code == 200
+    r = client.post("/api/experiments/start", json={"name": "testlab"})
+    assert r.status_code == 200
+    return client
+
+
+@pytest.fixture
+def storage(rpc):
+    """The shared Storage for ``testlab``, emptied of students and logs."""
+    from sqlalchemy import text
+
+    st = rpc._storage_for("testlab")
+    with st.engine.begin() as conn:
+        conn.execute(text("DELETE FROM logs"))
+        conn.execute(text("DELETE FROM students"))
+    st._update_student_ids(removed=tuple(st._cached_student_ids()))
+    st._invalidate_logs_cache()
+    st._invalidate_log_options()
+    return st
@@ -0,0 +1,94 @@
+import pytest
+
+from conftest import ADMIN_PASSWORD, ADMIN_USERNAME
+
+
+@pytest.fixture
+def counted(rpc, monkeypatch):
+    """Build a verifier for "secret" and count the PBKDF2 derivations it makes."""
+    from server import utils
+
+    salt = b"s" * 16
+    record = {"salt": salt.hex(), "password_hash": utils._pbkdf2("secret", salt, 1000).hex(), "iterations": 1000}
+    calls = []
+    real = utils._pbkdf2
+    monkeypatch.setattr(utils, "_pbkdf2", lambda *a, **kw: calls.append(a) or real(*a, **kw))
+    return utils._build_verifier_from_record(record), calls
+
+
+def test_success_is_cached_for_the_right_username_only(counted):
+    verify, calls = counted
+    assert verify("secret", True)
+    assert verify("secret", True)
+    assert len(calls) == 1
+
+    # A wrong username with the cached password pays the full derivation, like any failure
+    assert not verify("secret", False)
+    assert len(calls) == 2
+
+
+def test_wrong_username_never_primes_the_cache(counted):
+    verify, calls = counted
+    assert not verify("secret", False)
+    assert verify("secret", True)
+    assert len(calls) == 2
+
+
+def test_every_failure_costs_one_derivation(counted):
+    verify, calls = counted
+    assert verify("secret")
+    for pw, user_ok in (("wrong", True), ("wrong", False), ("secret", False)):
+        calls.clear()
+        assert not verify(pw, user_ok)
+        assert len(calls) == 1
+
+
+def test_unusable_record_still_derives(rpc, monkeypatch):
+    from server import utils
+
+    calls = []
+    real = utils._pbkdf2
+    monkeypatch.setattr(utils, "_pbkdf2", lambda *a, **kw: calls.append(a) or real(*a, **kw))
+    verify = utils._build_verifier_from_record({"iterations": 1000})
+    for user_ok in (True, False):
+        assert not verify("anything", user_ok)
+    assert len(calls) == 2
+
+
+def test_login_rejects_right_password_with_wrong_username(client):
+    assert client.post("/admin/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD}).status_code == 200
+    client.post("/admin/logout")
+    r = client.post("/admin/login", json={"username": "intruder", "password": ADMIN_PASSWORD})
+    assert r.status_code == 401
+    r = client.post("/exp/testlab/admin/login", json={"username": "intruder", "password": ADMIN_PASSWORD})
+    assert r.status_code == 401
+
+
+def _username_only_verifier(rpc, tmp_path, monkeypatch):
+    from server import utils
+
+    monkeypatch.delenv("ADMIN_USERNAME")
+    monkeypatch.delenv("ADMIN_PASSWORD")
+    path = tmp_path / "admin_credentials.json"
+    path.write_text('{"username": "admin"}')
+    return utils.load_admin_credentials(str(path))
+
+
+def test_username_only_credentials_reject_logins(rpc, client, tmp_path, monkeypatch):
+    username, verify = _username_only_verifier(rpc, tmp_path, monkeypatch)
+    assert username == "admin"
+    monkeypatch.setattr(rpc, "_DEFAULT_ADMIN_VERIFY", verify)
+    r = client.post("/admin/login", json={"username": "admin", "password": "anything"})
+    assert r.status_code == 401
+
+
+def test_username_only_credentials_still_derive(rpc, tmp_path, monkeypatch):
+    from server import utils
+
+    _, verify = _username_only_verifier(rpc, tmp_path, monkeypatch)
+    calls = []
+    real = utils._pbkdf2
+    monkeypatch.setattr(utils, "_pbkdf2", lambda *a, **kw: calls.append(a) or real(*a, **kw))
+    for user_ok in (True, False):
+        assert not verify("anything", user_ok)
+    assert len(calls) == 2
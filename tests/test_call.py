@@ -0,0 +1,108 @@
+import json
+import time
+
+
+def _call(client, func_name, args, student_id="s1", **extra):
+    body = {"student_id": student_id, "func_name": func_name, "args": args,
+            "experiment_name": "testlab", **extra}
+    return client.post("/call", json=body)
+
+
+def _wait_for_logs(storage, count, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        storage._invalidate_logs_cache()
+        logs = storage.fetch_logs(n=1000)
+        if len(logs) >= count or time.monotonic() > deadline:
+            return logs
+        time.sleep(0.02)
+
+
+def test_call_returns_big_int_as_number(admin, storage):
+    storage.add_student(student_id="s1", name="S")
+
+    r = _call(admin, "echo", [10**30])
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/json"
+    assert json.loads(r.content) == {"result": 10**30}
+
+    (row,) = _wait_for_logs(storage, 1)
+    assert row["args_json"] == [10**30]
+    assert row["result_json"] == 10**30
+
+
+def test_call_response_is_the_json_encoding_of_the_result(admin, storage):
+    storage.add_student(student_id="s1", name="S")
+
+    payload = {"a": [1, 2.5, True, None], "b": "ü"}
+    r = _call(admin, "echo", [payload])
+    assert r.status_code == 200
+    assert json.loads(r.content) == {"result": payload}
+    assert _call(admin, "add", [2, 3]).json() == {"result": 5}
+
+
+def test_call_errors(admin, storage):
+    storage.add_student(student_id="s1", name="S")
+
+    assert _call(admin, "missing", []).status_code == 404
+    assert _call(admin, "echo", [1], student_id="nobody").status_code == 403
+    r = _call(admin, "fail", [])
+    assert r.status_code == 400
+    assert "boom" in r.json()["detail"]
+
+
+def test_plain_functions_default_to_the_threadpool(rpc):
+    from server.utils import CALL_ASYNC, CALL_INLINE, CALL_THREAD, get_call_mode
+
+    def plain():
+        pass
+
+    def marked():
+        pass
+    marked.__leap_inline__ = True
+
+    async def coro():
+        pass
+
+    assert get_call_mode(plain) == CALL_THREAD
+    assert get_call_mode(marked) == CALL_INLINE
+    assert get_call_mode(coro) == CALL_ASYNC
+
+
+def test_blocking_call_does_not_block_other_requests(rpc, admin, storage, project_root):
+    import threading
+
+    storage.add_student(student_id="s1", name="S")
+    fn = rpc._resolve_function(str(project_root / "experiments" / "testlab" / "funcs"), "wait_for_release")
+    entered, release = fn.__globals__["entered"], fn.__globals__["release"]
+    entered.clear()
+    release.clear()
+    replies = []
+    t = threading.Thread(target=lambda: replies.append(_call(admin, "wait_for_release", [10])))
+    t.start()
+    try:
+        assert entered.wait(10)
+        # Run on the event loop, the function would hold this request until it timed out
+        assert admin.get("/api/health").status_code == 200
+        assert not replies
+    finally:
+        release.set()
+        t.join()
+    assert replies[0].json() == {"result": True}
+
+
+def test_call_wrappers_do_not_keep_functions_alive(rpc):
+    import gc
+    import weakref
+
+    from server.utils import get_call_wrapper
+
+    for src in ("def f(a, b):\n    return a + b\n", "def f(*a):\n    return sum(a)\n"):
+        ns = {}
+        exec(src, ns)
+        assert get_call_wrapper(ns["f"])([2, 3]) == 5
+        assert get_call_wrapper(ns["f"]) is get_call_wrapper(ns["f"])
+        ref = weakref.ref(ns["f"])
+        del ns
+        gc.collect()
+        assert ref() is None
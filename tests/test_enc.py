@@ -0,0 +1,21 @@
+import json
+
+
+def test_big_int_stays_a_number(rpc):
+    from server.utils import enc, enc_bytes
+
+    assert enc_bytes(10**30) == b"1000000000000000000000000000000"
+    assert json.loads(enc_bytes({"x": [2**70, "a"]})) == {"x": [2**70, "a"]}
+    assert enc([-(10**20)]) == "[-100000000000000000000]"
+
+
+def test_unencodable_falls_back_to_repr(rpc):
+    from server.utils import enc_bytes
+
+    class Opaque:
+        __slots__ = ()
+
+        def __repr__(self):
+            return "<opaque>"
+
+    assert enc_bytes(Opaque()) == b'"<opaque>"'
@@ -0,0 +1,57 @@
+import json
+
+
+def _log(storage, student_id, trial):
+    storage.log_event(
+        student_id=student_id, experiment_name="testlab", trial=trial,
+        func_name="echo", args_json="[1]", result_json="1", error=None,
+    )
+
+
+def test_empty_trial_alias_falls_through_to_next(admin, storage):
+    _log(storage, "s1", "t1")
+    _log(storage, "s1", "t2")
+
+    logs = admin.get("/logs", params={"trial": "", "exp": "t2"}).json()["logs"]
+    assert [row["trial"] for row in logs] == ["t2"]
+
+
+def test_empty_student_alias_falls_through_to_sid(admin, storage):
+    _log(storage, "s1", "t1")
+    _log(storage, "s2", "t1")
+
+    logs = admin.get("/logs", params={"student_id": "", "sid": "s2"}).json()["logs"]
+    assert [row["student_id"] for row in logs] == ["s2"]
+
+
+def test_all_aliases_empty_means_no_filter(admin, storage):
+    _log(storage, "s1", "t1")
+    _log(storage, "s2", "t2")
+
+    logs = admin.get("/logs", params={"trial": "", "sid": ""}).json()["logs"]
+    assert len(logs) == 2
+
+
+def test_logs_keep_big_ints_as_numbers(admin, storage):
+    storage.log_event(
+        student_id="s1", experiment_name="testlab", trial="t1",
+        func_name="echo", args_json="[1000000000000000000000000000000]",
+        result_json="1000000000000000000000000000000", error=None,
+    )
+
+    r = admin.get("/logs")
+    assert r.status_code == 200
+    (row,) = json.loads(r.content)["logs"]
+    assert row["args_json"] == [10**30]
+    assert row["result_json"] == 10**30
+
+
+def test_out_of_range_timestamps_are_rejected(admin, storage):
+    for params in ({"start_ts": 99999999999999}, {"end_ts": -99999999999999}):
+        assert admin.get("/logs", params=params).status_code == 422
+
+
+def test_timestamp_window_filters(admin, storage):
+    _log(storage, "s1", "t1")
+    assert len(admin.get("/logs", params={"start_ts": 0, "end_ts": 253402300799}).json()["logs"]) == 1
+    assert admin.get("/logs", params={"end_ts": 0}).json()["logs"] == []
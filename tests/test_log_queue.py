@@ -0,0 +1,69 @@
+from fastapi.testclient import TestClient
+
+from conftest import ADMIN_PASSWORD, ADMIN_USERNAME
+
+
+def _start(client):
+    client.post("/admin/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    assert client.post("/api/experiments/start", json={"name": "testlab"}).status_code == 200
+
+
+def _all_logs(storage):
+    storage._invalidate_logs_cache()
+    return storage.fetch_logs(n=10_000, order="earliest")
+
+
+def test_queued_rows_are_written_on_shutdown(rpc, storage):
+    storage.add_student(student_id="s1", name="S")
+    rpc._server_state.set_active_experiment(None)
+    with TestClient(rpc.app) as client:
+        _start(client)
+        for i in range(3):
+            body = {"student_id": "s1", "func_name": "echo", "args": [i], "experiment_name": "testlab"}
+            assert client.post("/call", json=body).status_code == 200
+    rpc._server_state.set_active_experiment(None)
+
+    assert [row["args_json"] for row in _all_logs(storage)] == [[0], [1], [2]]
+
+
+def test_overflow_rows_are_written_on_shutdown(rpc, storage, monkeypatch):
+    monkeypatch.setattr(rpc, "_LOG_QUEUE_MAX", 2)
+    storage.add_student(student_id="s1", name="S")
+    rpc._server_state.set_active_experiment(None)
+    with TestClient(rpc.app) as client:
+        _start(client)
+        for i in range(20):
+            body = {"student_id": "s1", "func_name": "echo", "args": [i], "experiment_name": "testlab"}
+            assert client.post("/call", json=body).status_code == 200
+    rpc._server_state.set_active_experiment(None)
+
+    assert sorted(row["args_json"][0] for row in _all_logs(storage)) == list(range(20))
+
+
+def test_rows_are_written_directly_without_a_running_flusher(rpc, storage):
+    rpc._enqueue_log(
+        storage, student_id="s1", experiment_name="testlab", trial=None,
+        func_name="echo", args_json="[7]", result_json="7", error=None,
+    )
+    assert [row["args_json"] for row in _all_logs(storage)] == [[7]]
+
+
+def test_rows_are_stamped_when_the_call_happens(rpc, storage, monkeypatch):
+    import time
+
+    storage.add_student(student_id="s1", name="S")
+    # Hold the flusher back so the whole run lands in one batch
+    monkeypatch.setattr(rpc, "_LOG_FLUSH_INTERVAL", 1.0)
+    rpc._server_state.set_active_experiment(None)
+    with TestClient(rpc.app) as client:
+        _start(client)
+        for i in range(3):
+            body = {"student_id": "s1", "func_name": "echo", "args": [i], "experiment_name": "testlab"}
+            assert client.post("/call", json=body).status_code == 200
+            time.sleep(0.01)
+    rpc._server_state.set_active_experiment(None)
+
+    logs = _all_logs(storage)
+    assert [row["args_json"] for row in logs] == [[0], [1], [2]]
+    stamps = [row["ts"] for row in logs]
+    assert stamps == sorted(stamps) and len(set(stamps)) == 3
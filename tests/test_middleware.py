@@ -0,0 +1,91 @@
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from conftest import ADMIN_PASSWORD, ADMIN_USERNAME
+
+
+def _cors_client(rpc, origins):
+    from server.utils import LeanCORSMiddleware
+
+    async def hello(request):
+        return PlainTextResponse("hi")
+
+    app = Starlette(routes=[Route("/hello", hello, methods=["GET", "POST"])])
+    return TestClient(LeanCORSMiddleware(app, allow_origins=origins, allow_credentials=True))
+
+
+def test_cors_preflight_is_answered_directly(rpc):
+    client = _cors_client(rpc, ["https://ok.example"])
+    r = client.options("/hello", headers={
+        "Origin": "https://ok.example",
+        "Access-Control-Request-Method": "POST",
+        "Access-Control-Request-Headers": "content-type",
+    })
+    assert r.status_code == 204
+    assert r.headers["access-control-allow-origin"] == "https://ok.example"
+    assert r.headers["access-control-allow-credentials"] == "true"
+    assert r.headers["access-control-allow-headers"] == "content-type"
+    assert "POST" in r.headers["access-control-allow-methods"]
+
+
+def test_cors_rejects_unknown_origins(rpc):
+    client = _cors_client(rpc, ["https://ok.example"])
+    r = client.options("/hello", headers={"Origin": "https://evil.example", "Access-Control-Request-Method": "GET"})
+    assert r.status_code == 400
+    r = client.get("/hello", headers={"Origin": "https://evil.example"})
+    assert r.status_code == 200
+    assert "access-control-allow-origin" not in r.headers
+
+
+def test_cors_headers_on_simple_requests(rpc):
+    client = _cors_client(rpc, ["*"])
+    r = client.get("/hello", headers={"Origin": "null"})
+    assert r.headers["access-control-allow-origin"] == "null"
+    assert r.headers["vary"] == "Origin"
+    assert "access-control-allow-origin" not in client.get("/hello").headers
+
+
+def test_root_app_answers_preflight(client):
+    r = client.options("/call", headers={"Origin": "https://x.example", "Access-Control-Request-Method": "POST"})
+    assert r.status_code == 204
+    assert r.headers["access-control-allow-origin"] == "https://x.example"
+
+
+def test_ui_guard_redirects_while_lab_is_inactive(client):
+    r = client.get("/exp/testlab/ui/index.html", follow_redirects=False)
+    assert r.status_code == 307
+    assert r.headers["location"] == "/"
+    # Admin endpoints stay reachable so the lab can be logged into
+    assert client.get("/exp/testlab/admin/ping", follow_redirects=False).status_code == 401
+
+
+def test_ui_guard_serves_the_active_lab_without_caching(admin):
+    r = admin.get("/exp/testlab/ui/index.html", follow_redirects=False)
+    assert r.status_code == 200
+    assert r.text == "<html><body>testlab</body></html>"
+    assert r.headers["cache-control"] == "no-store, no-cache, must-revalidate, max-age=0"
+    assert r.headers["pragma"] == "no-cache"
+    assert admin.get("/exp/testlab/admin/ping").json() == {"ok": True}
+
+
+def test_stopping_the_lab_restores_the_redirect(admin):
+    assert admin.post("/api/experiments/stop").status_code == 200
+    assert admin.get("/exp/testlab/ui/index.html", follow_redirects=False).status_code == 307
+
+
+def test_session_is_only_read_on_scoped_paths(client):
+    r = client.post("/admin/login", json={"username": ADMIN_USERNAME, "password": ADMIN_PASSWORD})
+    assert r.status_code == 200
+    assert "session" in r.cookies
+    assert client.get("/admin/ping").json() == {"ok": True}
+    # /call is outside the session prefixes: no cookie is issued or refreshed
+    r = client.post("/call", json={"student_id": "s", "func_name": "echo", "args": [], "experiment_name": "x"})
+    assert "set-cookie" not in r.headers
+
+
+def test_wrong_login_is_rejected(client):
+    r = client.post("/admin/login", json={"username": ADMIN_USERNAME, "password": "nope"})
+    assert r.status_code == 401
+    assert client.get("/admin/ping").status_code == 401
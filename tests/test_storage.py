@@ -0,0 +1,100 @@
+def _log(storage, student_id="s1", trial="t1", args_json="[1]", result_json="1"):
+    storage.log_event(
+        student_id=student_id, experiment_name="testlab", trial=trial,
+        func_name="echo", args_json=args_json, result_json=result_json, error=None,
+    )
+
+
+def test_stored_json_keeps_big_ints_exact(storage):
+    _log(storage, args_json="[100000000000000000000000000000]", result_json='{"x": -123456789012345678901}')
+    (row,) = storage.fetch_logs()
+    assert row["args_json"] == [10**29]
+    assert row["result_json"] == {"x": -123456789012345678901}
+
+
+def test_stored_json_that_does_not_parse_is_returned_raw(storage):
+    _log(storage, args_json="not json", result_json="12345678901234567890123 nope")
+    (row,) = storage.fetch_logs()
+    assert row["args_json"] == "not json"
+    assert row["result_json"] == "12345678901234567890123 nope"
+
+
+def test_student_caches_follow_adds_and_deletes(storage):
+    assert storage.students_json() == b'{"students":[]}'
+    assert not storage.student_exists("s1")
+
+    storage.add_student(student_id="s1", name="One")
+    assert storage.student_exists("s1")
+    assert b'"s1"' in storage.students_json()
+
+    result = storage.add_students_bulk([{"student_id": "s2", "name": "Two"}, {"student_id": "s1", "name": "Dup"}])
+    assert (result["added"], result["skipped"]) == (1, 1)
+    assert storage.student_exists("s2")
+    assert b'"s2"' in storage.students_json()
+
+    assert storage.delete_student("s1")
+    assert not storage.student_exists("s1")
+    assert b'"s1"' not in storage.students_json()
+    assert not storage.delete_student("s1")
+
+
+def test_logs_cache_is_cleared_by_writes_and_deletes(storage):
+    assert storage.fetch_logs() == []
+
+    _log(storage, student_id="s1")
+    assert len(storage.fetch_logs()) == 1
+
+    storage.log_events_bulk([
+        {"student_id": "s2", "experiment_name": "testlab", "trial": "t2", "func_name": "echo",
+         "args_json": "[2]", "result_json": "2", "error": None},
+    ])
+    assert len(storage.fetch_logs()) == 2
+
+    storage.delete_logs_by_student("s1")
+    assert [row["student_id"] for row in storage.fetch_logs()] == ["s2"]
+
+
+def test_delete_student_drops_their_logs_and_options(storage):
+    storage.add_student(student_id="s1", name="One")
+    _log(storage, student_id="s1", trial="t1")
+    _log(storage, student_id="s2", trial="t2")
+    assert storage.log_options() == (["s1", "s2"], ["t1", "t2"])
+
+    # Inserts are merged into the cached options without a rescan
+    _log(storage, student_id="s3", trial="t3")
+    assert storage.log_options() == (["s1", "s2", "s3"], ["t1", "t2", "t3"])
+
+    assert storage.delete_student("s1")
+    assert [row["student_id"] for row in storage.fetch_logs(order="earliest")] == ["s2", "s3"]
+    assert storage.log_options() == (["s2", "s3"], ["t2", "t3"])
+
+
+def test_fetch_logs_filters(storage):
+    _log(storage, student_id="s1", trial="t1")
+    _log(storage, student_id="s2", trial="t1")
+    _log(storage, student_id="s2", trial="t2")
+
+    assert len(storage.fetch_logs(student_id="s2")) == 2
+    assert len(storage.fetch_logs(trial="t1")) == 2
+    assert len(storage.fetch_logs(student_id="s2", trial="t2")) == 1
+    assert len(storage.fetch_logs(n=1)) == 1
+
+
+def test_rows_keep_their_own_timestamps(storage):
+    import datetime
+
+    t0 = datetime.datetime(2025, 1, 2, 3, 4, 5, 123456)
+    rows = [
+        {"student_id": "s1", "experiment_name": "testlab", "trial": "t1", "func_name": "echo",
+         "args_json": f"[{i}]", "result_json": "1", "error": None, "ts": t0 + datetime.timedelta(seconds=i)}
+        for i in range(3)
+    ]
+    storage.log_events_bulk(rows)
+    _log(storage, student_id="s2")
+    storage.log_event(student_id="s3", experiment_name="testlab", trial="t1", func_name="echo",
+                      args_json="[9]", result_json="9", error=None, ts=t0 - datetime.timedelta(days=1))
+
+    logs = storage.fetch_logs(order="earliest")
+    assert [row["student_id"] for row in logs] == ["s3", "s1", "s1", "s1", "s2"]
+    assert [row["args_json"] for row in logs[1:4]] == [[0], [1], [2]]
+    assert logs[1]["ts"].startswith("2025-01-02T03:04:05.123456")